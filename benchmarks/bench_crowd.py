@@ -0,0 +1,102 @@
+"""Crowd-mode throughput against tile grid and worker thread count.
+
+Give --image a photo; with --copies N it is scaled down and pasted N times
+across a wide canvas to stand in for a crowd of distant faces. Without an
+image a noise frame is used, which times the detectors but finds nobody.
+
+    python benchmarks/bench_crowd.py --image face.jpg --copies 12 --output crowd.json
+    python benchmarks/bench_crowd.py --grids 1x1,2x2,3x3 --workers 1,2,4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from crowd_mode import TiledDetector, TILE_OVERLAP
+from detector_backends import select_backend, BACKEND_CHOICES
+
+
+def crowd_frame(image, copies, size, rng):
+    """Canvas of the given (w, h) with copies of image pasted at random small scales"""
+    w, h = size
+    if image is None:
+        return rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    if copies <= 1:
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    canvas = np.full((h, w, 3), 90, dtype=np.uint8)
+    for _ in range(copies):
+        face_h = int(rng.uniform(0.08, 0.16) * h)
+        face_w = int(face_h * image.shape[1] / image.shape[0])
+        small = cv2.resize(image, (face_w, face_h), interpolation=cv2.INTER_AREA)
+        x = int(rng.integers(0, w - face_w))
+        y = int(rng.integers(0, h - face_h))
+        canvas[y:y + face_h, x:x + face_w] = small
+    return canvas
+
+
+def measure(detector, rgb, frames):
+    for _ in range(3):
+        detector.process(rgb)   # Let trackers settle
+    faces = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        results = detector.process(rgb)
+        faces = len(results.multi_face_landmarks or [])
+    elapsed = time.perf_counter() - start
+    return {'fps': frames / elapsed, 'ms_per_frame': elapsed / frames * 1000, 'faces': faces}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', help="photo containing a face")
+    parser.add_argument('--copies', type=int, default=1, help="paste the face this many times")
+    parser.add_argument('--size', type=int, nargs=2, default=[1920, 1080], metavar=('W', 'H'))
+    parser.add_argument('--grids', default='1x1,2x1,2x2,3x2,4x3', help="comma separated COLSxROWS")
+    parser.add_argument('--workers', default=f"1,2,4,{os.cpu_count()}", help="comma separated")
+    parser.add_argument('--detector', choices=BACKEND_CHOICES, default='mesh')
+    parser.add_argument('--max-faces', type=int, default=4, help="per tile")
+    parser.add_argument('--overlap', type=float, default=TILE_OVERLAP)
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    image = cv2.imread(args.image) if args.image else None
+    frame = crowd_frame(image, args.copies, tuple(args.size), np.random.default_rng(0))
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def make_backend():
+        return select_backend({1}, name=args.detector, max_faces=args.max_faces)
+
+    runs = []
+    for grid in args.grids.split(','):
+        cols, rows = (int(n) for n in grid.split('x'))
+        for workers in sorted({min(int(n), cols * rows) for n in args.workers.split(',')}):
+            detector = TiledDetector(make_backend, cols, rows, args.overlap, workers)
+            try:
+                run = measure(detector, rgb, args.frames)
+            finally:
+                detector.close()
+            run.update({'grid': grid, 'tiles': cols * rows, 'workers': workers,
+                        'duplicates_merged_per_frame': detector.duplicates / (args.frames + 3)})
+            runs.append(run)
+            print(f"{grid} tiles, {workers} workers: {run['fps']:.1f} fps, {run['faces']} faces",
+                  file=sys.stderr)
+
+    results = {'cpu_count': os.cpu_count(), 'frame_size': args.size, 'copies': args.copies,
+               'detector': args.detector, 'runs': runs}
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Recognition throughput/accuracy benchmark for FaceDatabase.
+
+Builds synthetic galleries (or uses a fixture directory), then measures
+construction time, memory, search latency, and the post-detection
+recognition path (quality gate, LBP feature, search) on pre-cropped face
+ROIs. The synthetic textures are not faces, so the full is_friendly path
+mostly times a failed Haar detection; its hit rate is reported next to it.
+Genuine and impostor distances are reported with the threshold that best
+separates them, to calibrate MATCH_THRESHOLDS against a real --gallery.
+Results are written as JSON; pass --baseline to compare against an
+earlier run.
+
+    python benchmarks/bench_face_db.py --sizes 10 100 1000 10000 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from face_db import FaceDatabase
+from face_index import FACE_SIZE, lbp_feature
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def synthetic_face(rng, identity_seed):
+    """A blurred noise texture unique per identity, with a little per-image jitter"""
+    base = np.random.default_rng(identity_seed).integers(0, 255, (32, 32), dtype=np.uint8)
+    img = cv2.resize(base, (120, 120), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 6, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def make_gallery(root, n_images, per_identity, seed=0):
+    rng = np.random.default_rng(seed)
+    n_identities = max(1, n_images // per_identity)
+    for i in range(n_images):
+        identity = i % n_identities
+        person_dir = os.path.join(root, f"person_{identity:05d}")
+        os.makedirs(person_dir, exist_ok=True)
+        cv2.imwrite(os.path.join(person_dir, f"{i:06d}.png"), synthetic_face(rng, identity))
+    return n_identities
+
+
+def synthetic_queries(n_identities):
+    """Fresh renders of known identities, so accuracy is checkable"""
+    def make(db, rng, count):
+        identities = rng.integers(0, n_identities, count)
+        return ([f"person_{i:05d}" for i in identities],
+                [synthetic_face(rng, int(i)) for i in identities])
+    return make
+
+
+def gallery_queries(db, rng, count):
+    """Images sampled from the gallery itself; their own row is left out of the distances"""
+    images = [(name, path) for name, paths in db.scan_friendly_dir().items() for path in paths]
+    names, crops = [], []
+    for i in rng.integers(0, len(images), count):
+        name, path = images[i]
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            names.append(name)
+            crops.append(img)
+    return names, crops
+
+
+def recognize_roi(db, gray):
+    """is_friendly after Haar detection: gate, LBP feature and search on a face ROI"""
+    if not db.quality_gate.check(gray):
+        return None
+    name, distance = db.face_index.search(lbp_feature(cv2.resize(gray, FACE_SIZE)))
+    return name is not None and distance < db.match_threshold
+
+
+def distance_report(db, names, features):
+    """Distance to the closest image of the query's own identity vs the closest other one.
+
+    Exact matches are skipped: a query taken from the gallery would find itself.
+    """
+    genuine, impostor = [], []
+    hits = 0
+    for name, feature in zip(names, features):
+        dist, labels = db.face_index.distances(feature)
+        keep = dist > 0
+        dist, labels = dist[keep], labels[keep]
+        if not len(dist):
+            continue
+        own = labels == db.identities.index(name)
+        hits += bool(own[np.argmin(dist)])
+        if own.any():
+            genuine.append(float(dist[own].min()))
+        if (~own).any():
+            impostor.append(float(dist[~own].min()))
+    report = {'top1_accuracy': hits / max(len(features), 1),
+              'genuine': percentiles(genuine), 'impostor': percentiles(impostor),
+              'threshold': db.match_threshold}
+    if genuine and impostor:
+        # Threshold with the fewest genuine rejects plus impostor accepts
+        genuine, impostor = np.array(genuine), np.array(impostor)
+        values = np.unique(np.concatenate([genuine, impostor]))
+        candidates = (values[:-1] + values[1:]) / 2 if len(values) > 1 else values
+        errors = np.array([np.mean(genuine >= t) + np.mean(impostor < t) for t in candidates])
+        tied = candidates[errors == errors.min()]
+        report['best_threshold'] = float((tied.min() + tied.max()) / 2)
+        report['best_error_rate'] = float(errors.min() / 2)
+        report['false_reject_rate'] = float(np.mean(genuine >= db.match_threshold))
+        report['false_accept_rate'] = float(np.mean(impostor < db.match_threshold))
+    return report
+
+
+def percentiles(values):
+    if not values:
+        return None
+    return {f'p{p}': float(np.percentile(values, p)) for p in (5, 50, 95)}
+
+
+def timed(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000.0
+    return {
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'per_second': float(1000.0 / latencies.mean()) if latencies.mean() > 0 else None,
+    }
+
+
+def bench_gallery(gallery_dir, make_queries, args):
+    rng = np.random.default_rng(1)
+    result = {'images': None, 'identities': None}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    db = FaceDatabase(gallery_dir, metric=args.metric)
+    result['construct_s'] = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result['images'] = len(db.face_index)
+    result['identities'] = len(db.identities)
+    result['memory'] = {
+        'index_bytes': db.face_index.nbytes,
+        'traced_current_bytes': current,
+        'traced_peak_bytes': peak,
+    }
+    result['coarse_index'] = db.face_index.centroids is not None
+
+    names, crops = make_queries(db, rng, args.queries)
+    features = [lbp_feature(cv2.resize(c, FACE_SIZE)) for c in crops]
+    bgr_crops = [cv2.cvtColor(c, cv2.COLOR_GRAY2BGR) for c in crops]
+
+    q = iter(range(10 ** 9))
+    result['search'] = timed(lambda: db.face_index.search(features[next(q) % len(features)]),
+                             args.repeats)
+
+    start = time.perf_counter()
+    db.face_index.search_batch(features)
+    elapsed = time.perf_counter() - start
+    result['search_batch'] = {'batch': len(features), 'total_ms': elapsed * 1000.0,
+                              'per_second': len(features) / elapsed}
+
+    result['distances'] = distance_report(db, names, features)
+    result['top1_accuracy'] = result['distances'].pop('top1_accuracy')
+
+    # Recognition after detection: what scales with the gallery
+    q = iter(range(10 ** 9))
+    result['recognize_roi'] = timed(lambda: recognize_roi(db, crops[next(q) % len(crops)]),
+                                    args.repeats)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda crop: recognize_roi(db, crop), crops))
+        elapsed = time.perf_counter() - start
+    result['recognize_roi_threaded'] = {'workers': args.workers, 'batch': len(crops),
+                                        'per_second': len(crops) / elapsed}
+
+    # Full path: quality gate, Haar detection and matching. Crops Haar finds
+    # no face in return before the search, so read this next to the hit rate
+    detector = db._thread_detector()
+    detected = sum(len(detector.detectMultiScale(c, 1.3, 5, minSize=db.min_face_size)) > 0
+                   for c in crops)
+    q = iter(range(10 ** 9))
+    result['is_friendly'] = timed(lambda: db.is_friendly(bgr_crops[next(q) % len(bgr_crops)]),
+                                  args.repeats)
+    result['is_friendly']['detection_hit_rate'] = detected / len(crops)
+    return result
+
+
+def compare(results, baseline):
+    """Print ratios of the headline numbers against a baseline run"""
+    base_runs = {run['size']: run for run in baseline.get('runs', [])}
+    for run in results['runs']:
+        base = base_runs.get(run['size'])
+        if base is None:
+            continue
+        print(f"size {run['size']}: "
+              f"construct x{run['construct_s'] / base['construct_s']:.2f}, "
+              f"search p50 x{run['search']['p50_ms'] / base['search']['p50_ms']:.2f}, "
+              f"recognize_roi p50 x{run['recognize_roi']['p50_ms'] / base['recognize_roi']['p50_ms']:.2f}, "
+              f"index bytes x{run['memory']['index_bytes'] / max(base['memory']['index_bytes'], 1):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--per-identity', type=int, default=5)
+    parser.add_argument('--gallery', help="Use an existing friendly_dir instead of synthetic images")
+    parser.add_argument('--metric', choices=['chi2', 'cosine'], default='chi2')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    parser.add_argument('--baseline', help="Earlier JSON output to compare against")
+    args = parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'metric': args.metric,
+        'runs': [],
+    }
+
+    if args.gallery:
+        run = bench_gallery(args.gallery, gallery_queries, args)
+        run['size'] = run['images']
+        results['runs'].append(run)
+    else:
+        for size in args.sizes:
+            root = tempfile.mkdtemp(prefix='face_bench_')
+            try:
+                n_identities = make_gallery(root, size, args.per_identity)
+                run = bench_gallery(root, synthetic_queries(n_identities), args)
+                run['size'] = size
+                results['runs'].append(run)
+                print(f"{size} images: construct {run['construct_s']:.2f}s, "
+                      f"search p50 {run['search']['p50_ms']:.2f}ms, "
+                      f"recognize_roi p50 {run['recognize_roi']['p50_ms']:.2f}ms, "
+                      f"accuracy {run['top1_accuracy']:.2f}, "
+                      f"detection hit rate {run['is_friendly']['detection_hit_rate']:.2f}",
+                      file=sys.stderr)
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
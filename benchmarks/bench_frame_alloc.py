@@ -0,0 +1,180 @@
+"""Steady-state allocation of the forehead_detector frame pipeline; exits 1 on a regression.
+
+Replays frames (from --video, else synthetic) through FramePipeline the way
+the detector loop does: enhance, inference-scale, RGB convert and outline
+points for a face. After a warm-up every frame should reuse its buffers,
+so tracemalloc's per-frame peak stays far below one frame's size and
+neither traced memory nor RSS grows across the run.
+
+    python benchmarks/bench_frame_alloc.py --frames 10000 --output alloc.json
+    python benchmarks/bench_frame_alloc.py --legacy     # the old allocating path, for comparison
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from detector_backends import ArrayLandmarks
+from frame_pipeline import FramePipeline
+from head_tracking import FACE_OUTLINE_POINTS as OUTLINE
+
+
+def load_frames(video, size, count, rng):
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+    if not frames:
+        w, h = size
+        for _ in range(count):
+            frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+            cv2.ellipse(frame, (w // 2, h // 2), (w // 8, h // 5), 0, 0, 360, (150, 170, 210), -1)
+            frames.append(frame)
+    return frames
+
+
+def fake_face(rng):
+    points = np.empty((468, 3), dtype=np.float32)
+    points[:, :2] = rng.uniform(0.35, 0.65, (468, 2))
+    points[:, 2] = 0.0
+    return ArrayLandmarks(points)
+
+
+def legacy_frame(frame, display_size, scale, face):
+    # The loop as it was before FramePipeline
+    frame = cv2.bilateralFilter(frame, 5, 75, 75)
+    frame = cv2.convertScaleAbs(frame, alpha=1.1, beta=5)
+    frame = cv2.resize(frame, display_size, interpolation=cv2.INTER_LANCZOS4)
+    inference = frame
+    if scale < 1.0:
+        inference = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    cv2.cvtColor(inference, cv2.COLOR_BGR2RGB)
+    h, w = frame.shape[:2]
+    points = []
+    for index in OUTLINE:
+        p = face.landmark[index]
+        points.append((int(p.x * w), int(p.y * h)))
+    return cv2.minEnclosingCircle(np.array(points, dtype=np.int32))
+
+
+def pipeline_frame(pipeline, frame, scale, face):
+    frame = pipeline.enhance(frame)
+    pipeline.rgb(pipeline.scale('inference', frame, scale))
+    h, w = frame.shape[:2]
+    return cv2.minEnclosingCircle(pipeline.outline_points(face, OUTLINE, w, h))
+
+
+def rss_bytes():
+    # Resident set size from /proc; None where that isn't available
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure(step, frames, count, warmup):
+    for i in range(warmup):
+        step(frames[i % len(frames)])
+
+    rss_start = rss_bytes()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    peaks = np.empty(count)
+    start = time.perf_counter()
+    for i in range(count):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        step(frames[i % len(frames)])
+        peaks[i] = tracemalloc.get_traced_memory()[1] - before
+    elapsed = time.perf_counter() - start
+    growth = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    rss_end = rss_bytes()
+
+    return {
+        'frames': count,
+        'ms_per_frame': elapsed / count * 1000,     # Includes tracemalloc's overhead
+        'peak_bytes_per_frame_median': float(np.median(peaks)),
+        'peak_bytes_per_frame_max': float(peaks.max()),
+        'traced_growth_bytes': growth,
+        'rss_drift_bytes': rss_end - rss_start if rss_start is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--video', help="replay frames from this file instead of synthetic ones")
+    parser.add_argument('--camera-size', type=int, nargs=2, default=[1280, 720], metavar=('W', 'H'))
+    parser.add_argument('--display-size', type=int, nargs=2, default=[1280, 720], metavar=('W', 'H'))
+    parser.add_argument('--scale', type=float, default=0.75, help="inference scale")
+    parser.add_argument('--frames', type=int, default=10000)
+    parser.add_argument('--distinct', type=int, default=8, help="distinct frames cycled through")
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--legacy', action='store_true', help="measure the old allocating loop instead")
+    parser.add_argument('--max-frame-bytes', type=int, default=64 * 1024,
+                        help="fail if the median per-frame peak exceeds this")
+    parser.add_argument('--max-growth', type=int, default=1024 * 1024,
+                        help="fail if traced memory grows more than this over the run")
+    parser.add_argument('--max-rss-drift', type=int, default=32 * 1024 * 1024,
+                        help="fail if RSS grows more than this over the run")
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = load_frames(args.video, tuple(args.camera_size), args.distinct, rng)
+    face = fake_face(rng)
+    display_size = tuple(args.display_size)
+
+    if args.legacy:
+        def step(frame):
+            legacy_frame(frame, display_size, args.scale, face)
+    else:
+        pipeline = FramePipeline(display_size)
+
+        def step(frame):
+            pipeline_frame(pipeline, frame, args.scale, face)
+
+    results = measure(step, frames, args.frames, args.warmup)
+    results.update({'path': 'legacy' if args.legacy else 'pipeline',
+                    'camera_size': list(frames[0].shape[1::-1]), 'display_size': args.display_size,
+                    'frame_bytes': display_size[0] * display_size[1] * 3})
+    if not args.legacy:
+        results['buffers_allocated'] = pipeline.allocations
+
+    failures = []
+    if results['peak_bytes_per_frame_median'] > args.max_frame_bytes:
+        failures.append(f"median per-frame peak {results['peak_bytes_per_frame_median']:.0f} bytes "
+                        f"> {args.max_frame_bytes}")
+    if results['traced_growth_bytes'] > args.max_growth:
+        failures.append(f"traced memory grew {results['traced_growth_bytes']} bytes > {args.max_growth}")
+    drift = results['rss_drift_bytes']
+    if drift is not None and drift > args.max_rss_drift:
+        failures.append(f"RSS drifted {drift} bytes > {args.max_rss_drift}")
+    results['failures'] = failures
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Landmark log write cost, size against JSON, and full-session scan speed.
+
+    python benchmarks/bench_landmark_log.py --minutes 10 --faces 2 --output log.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from detector_backends import ArrayLandmarks
+from landmark_log import LandmarkLog, LandmarkRecorder, MAX_POINTS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--minutes', type=float, default=5.0, help="session length at --fps")
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--faces', type=int, default=1, help="faces per frame")
+    parser.add_argument('--quantized', action='store_true')
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = int(args.minutes * 60 * args.fps)
+    face = ArrayLandmarks(rng.uniform(0, 1, (MAX_POINTS, 3)).astype(np.float32))
+    directory = tempfile.mkdtemp(prefix='landmarks-')
+    try:
+        recorder = LandmarkRecorder(directory, quantized=args.quantized)
+        start = time.perf_counter()
+        for frame in range(frames):
+            for track in range(args.faces):
+                recorder.add(frame / args.fps, track, face)
+        recorder.close()
+        write = time.perf_counter() - start
+
+        log = LandmarkLog(directory)
+        size = log.summary()['bytes']
+        start = time.perf_counter()
+        rows = 0
+        centre = np.zeros(2)
+        for times, tracks, landmarks in log.range():
+            rows += len(times)
+            centre += landmarks[:, 1, :2].astype(np.float32).sum(axis=0)   # Touch one point per row
+        scan = time.perf_counter() - start
+        middle = frames / args.fps / 2
+        start = time.perf_counter()
+        window = sum(len(t) for t, _, _ in log.range(middle, middle + 1.0))
+        seek = time.perf_counter() - start
+        log.close()
+    finally:
+        shutil.rmtree(directory)
+
+    json_bytes = len(json.dumps({'t': 0.0, 'track': 0,
+                                 'landmarks': face.points.round(6).tolist()}))
+    results = {
+        'rows': rows,
+        'quantized': args.quantized,
+        'write_us_per_face': write / rows * 1e6,
+        'bytes_per_face': size / rows,
+        'json_bytes_per_face': json_bytes,
+        'scan_rows_per_second': rows / scan,
+        'seek_one_second_ms': seek * 1000,
+        'rows_in_one_second': window,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Pong simulation throughput: scalar PongSim against the PongBatch NumPy mode.
+
+    python benchmarks/bench_pong_core.py --games 1 100 10000 100000 --output pong.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pong_core import PongSim, PongBatch
+
+WIDTH, HEIGHT, BALL_SPEED, SENSITIVITY = 800, 600, 6, 1.8
+
+
+def bench_scalar(ticks, dt):
+    sim = PongSim(WIDTH, HEIGHT, BALL_SPEED, SENSITIVITY, left_ai=True,
+                  rng=np.random.default_rng(0))
+    targets = 0.5 + 0.4 * np.sin(np.arange(ticks) / 17.0)
+    start = time.perf_counter()
+    for target in targets:
+        sim.step(right_target=target, dt=dt)
+    elapsed = time.perf_counter() - start
+    return {'games': 1, 'ticks': ticks, 'steps_per_second': ticks / elapsed}
+
+
+def bench_batch(n_games, ticks, dt):
+    batch = PongBatch(n_games, WIDTH, HEIGHT, BALL_SPEED, SENSITIVITY, left_ai=True, seed=0)
+    phase = np.random.default_rng(1).uniform(0, 2 * np.pi, n_games)
+    targets = [0.5 + 0.4 * np.sin(phase + i / 17.0) for i in range(ticks)]
+    start = time.perf_counter()
+    for target in targets:
+        batch.step(right_target=target, dt=dt)
+    elapsed = time.perf_counter() - start
+    return {
+        'games': n_games,
+        'ticks': ticks,
+        'steps_per_second': n_games * ticks / elapsed,
+        'mean_right_score': float(batch.right_score.mean()),
+        'mean_left_score': float(batch.left_score.mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, nargs='+', default=[1, 100, 10000, 100000])
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--dt', type=float, default=1.0, help="Step length in base ticks")
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    results = {'numpy': np.__version__, 'dt': args.dt,
+               'scalar': bench_scalar(args.ticks, args.dt), 'batch': []}
+    for n_games in args.games:
+        # Keep the total work roughly constant so large batches finish quickly
+        ticks = max(20, min(args.ticks, args.ticks * 1000 // n_games))
+        run = bench_batch(n_games, ticks, args.dt)
+        results['batch'].append(run)
+        print(f"{n_games} games: {run['steps_per_second'] / 1e6:.2f}M steps/s", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Per-frame draw cost of the pong games: time and transient allocations.
+
+Transient bytes are the tracemalloc peak above the steady-state level
+during one draw call; dividing by the canvas size gives the number of
+frame-sized buffers the draw allocated.
+
+    python benchmarks/bench_pong_render.py --frames 300 --output render.json
+    python benchmarks/bench_pong_render.py --legacy     # the old allocating backgrounds, for comparison
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import forehead_pong
+import two_player_pong
+from pong_render import RenderContext
+
+
+class LegacyRender(RenderContext):
+    # The backgrounds as they were drawn before RenderContext reused its canvas
+
+    def dimmed_background(self, frame):
+        game_frame = cv2.resize(frame, (self.width, self.height))
+        overlay = game_frame.copy()
+        cv2.addWeighted(overlay, 0.6, np.zeros_like(overlay), 0.4, 0, game_frame)
+        return game_frame
+
+    def gradient_background(self, frame):
+        screen = cv2.resize(frame, (self.width, self.height))
+        overlay = np.zeros_like(screen)
+        for i in range(self.height):
+            alpha = i / self.height
+            overlay[i] = [int(40 * alpha), int(100 * alpha), int(40 * alpha)]
+        cv2.addWeighted(overlay, 0.6, screen, 0.7, 0, screen)
+        return screen
+
+
+def measure(draw, frame, canvas_bytes, frames):
+    for _ in range(5):
+        draw(frame)  # Warm up caches and lazily built layers
+
+    times = []
+    transient = []
+    tracemalloc.start()
+    for _ in range(frames):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        draw(frame)
+        times.append(time.perf_counter() - start)
+        transient.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    times = np.array(times) * 1000.0
+    transient = np.array(transient)
+    return {
+        'mean_ms': float(times.mean()),
+        'p95_ms': float(np.percentile(times, 95)),
+        'transient_bytes': int(np.median(transient)),
+        'frame_buffers': float(np.median(transient) / canvas_bytes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--camera', type=int, nargs=2, default=[640, 480], metavar=('W', 'H'))
+    parser.add_argument('--legacy', action='store_true', help="measure the old allocating backgrounds instead")
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+    render = LegacyRender if args.legacy else RenderContext
+
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (args.camera[1], args.camera[0], 3), dtype=np.uint8)
+
+    results = {}
+    single = forehead_pong.PongGame()
+    single.player_ready = True
+    single.render = render(forehead_pong.WINDOW_WIDTH, forehead_pong.WINDOW_HEIGHT)
+    canvas = forehead_pong.WINDOW_WIDTH * forehead_pong.WINDOW_HEIGHT * 3
+    results['single_start_screen'] = measure(single.draw_start_screen, frame, canvas, args.frames)
+    results['single_draw'] = measure(single.draw, frame, canvas, args.frames)
+
+    two = two_player_pong.TwoPlayerPong()
+    two.render = render(two_player_pong.WINDOW_WIDTH, two_player_pong.WINDOW_HEIGHT)
+    canvas = two_player_pong.WINDOW_WIDTH * two_player_pong.WINDOW_HEIGHT * 3
+    results['two_start_screen'] = measure(lambda f: two.draw_start_screen(f, 2), frame, canvas, args.frames)
+    results['two_draw'] = measure(two.draw, frame, canvas, args.frames)
+
+    for name, run in results.items():
+        print(f"{name}: {run['mean_ms']:.2f}ms, {run['frame_buffers']:.1f} frame buffers", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
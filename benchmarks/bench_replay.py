@@ -0,0 +1,157 @@
+"""Simulation and render cost of a recorded pong session, replayed deterministically.
+
+Without --session a scripted session is recorded first (sinusoidal head
+motion, fixed seed), so runs on different machines or commits replay the
+exact same ticks and frames.
+
+--check-entry-point records from a game defined in __main__, as it is
+when started with `python forehead_pong.py --record ...`, and replays the
+file through pong_replay.py's command line; exits 1 if that fails.
+
+    python benchmarks/bench_replay.py --seconds 120 --output replay.json
+    python benchmarks/bench_replay.py --session my_game.pong --repeat 5
+    python benchmarks/bench_replay.py --check-entry-point --game two
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from pong_replay import SessionRecorder, replay
+
+
+GAME_SCRIPTS = {'single': ('forehead_pong.py', 'PongGame'), 'two': ('two_player_pong.py', 'TwoPlayerPong')}
+
+# Runs in a fresh interpreter: defines the game script's classes in __main__
+# without calling its main(), then records a scripted session from them
+ENTRY_POINT_RECORDER = """
+import sys
+sys.path.insert(0, {root!r})
+main = sys.modules['__main__']
+main.__file__ = {script!r}
+with open({script!r}) as f:
+    source = f.read().replace('if __name__ == "__main__":', 'if False:')
+exec(compile(source, {script!r}, 'exec'), main.__dict__)
+from bench_replay import record_scripted
+record_scripted({path!r}, {game!r}, 5, 30, 0, game_class={cls})
+"""
+
+
+def check_entry_point(game_name):
+    """Record as the game scripts do and replay with pong_replay.py; returns the replay stats or None"""
+    script, cls = GAME_SCRIPTS[game_name]
+    fd, path = tempfile.mkstemp(suffix='.pong')
+    os.close(fd)
+    try:
+        code = ENTRY_POINT_RECORDER.format(root=os.path.abspath(ROOT),
+                                           script=os.path.join(os.path.abspath(ROOT), script),
+                                           path=path, game=game_name, cls=cls)
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        subprocess.run([sys.executable, '-c', code], check=True, env=env)
+        replayed = subprocess.run([sys.executable, os.path.join(ROOT, 'pong_replay.py'), path],
+                                  capture_output=True, text=True)
+        if replayed.returncode != 0:
+            print(replayed.stderr, file=sys.stderr)
+            return None
+        return json.loads(replayed.stdout)
+    finally:
+        os.remove(path)
+
+
+def record_scripted(path, game_name, seconds, fps, seed, game_class=None):
+    """Play a game with a scripted head at a steady camera rate and record it"""
+    if game_class is None:
+        if game_name == 'two':
+            from two_player_pong import TwoPlayerPong as game_class
+        else:
+            from forehead_pong import PongGame as game_class
+    game = game_class(seed=seed)
+    if game_name == 'two':
+        game.left_player_ready = game.right_player_ready = True
+    else:
+        game.player_ready = True
+    game.recorder = SessionRecorder(path, game)
+
+    game.recorder.frame(0.0)
+    game.recorder.key(ord(' '))
+    game.handle_key(ord(' '))
+    game.timestep.reset(0.0)
+    for i in range(1, int(seconds * fps) + 1):
+        t = i / fps
+        head = 0.5 + 0.35 * math.sin(2 * math.pi * 0.4 * t)
+        if game_name == 'two':
+            game.update(head, 1 - head, now=t, capture_time=t)
+        else:
+            game.update(head, now=t, capture_time=t)
+        game.recorder.frame(t)
+    game.recorder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--session', help="replay this recording instead of a scripted one")
+    parser.add_argument('--game', choices=['single', 'two'], default='single')
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    parser.add_argument('--check-entry-point', action='store_true',
+                        help="check a recording made from the game script replays, then exit")
+    args = parser.parse_args()
+
+    if args.check_entry_point:
+        stats = check_entry_point(args.game)
+        ok = stats is not None and stats.get('matches_recording', False)
+        print(f"{GAME_SCRIPTS[args.game][0]} recording replays: {ok}"
+              + (f" ({stats['game']})" if stats else ""), file=sys.stderr)
+        sys.exit(0 if ok else 1)
+
+    path = args.session
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.pong')
+        os.close(fd)
+        record_scripted(path, args.game, args.seconds, args.fps, args.seed)
+
+    try:
+        sim = [replay(path) for _ in range(args.repeat)]
+        rendered = [replay(path, render=True) for _ in range(args.repeat)]
+        size = os.path.getsize(path)
+    finally:
+        if args.session is None:
+            os.remove(path)
+
+    best_sim = min(sim, key=lambda s: s['sim_seconds'])
+    best_render = min(rendered, key=lambda s: s['render_seconds'])
+    results = {
+        'game': best_sim['game'],
+        'ticks': best_sim['ticks'],
+        'frames': best_sim['frames'],
+        'session_bytes': size,
+        'sim_us_per_tick': best_sim['sim_seconds'] / max(best_sim['ticks'], 1) * 1e6,
+        'render_ms_per_frame': best_render['render_seconds'] / max(best_render['frames'], 1) * 1e3,
+        'headless_wall_seconds': best_sim['wall_seconds'],
+        'score': best_sim['score'],
+        'deterministic': all(s['score'] == best_sim['score'] for s in sim + rendered) and
+                         all(s.get('matches_recording', True) for s in sim + rendered),
+    }
+    print(f"{results['ticks']} ticks: {results['sim_us_per_tick']:.1f}us/tick sim, "
+          f"{results['render_ms_per_frame']:.2f}ms/frame render, "
+          f"deterministic={results['deterministic']}", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Loop frame rate while recording: VideoWriter.write inline against VideoRecorder.
+
+Runs a stand-in detector loop (fixed busy time per frame) that records
+every frame, and reports the loop's rate alongside encoded and dropped
+counts for each drop policy.
+
+    python benchmarks/bench_video_recorder.py --frames 600 --work-ms 15 --output video.json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from video_recorder import VideoRecorder, DROP_POLICIES, QUEUE_SIZE
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def run(write, frames, source, work):
+    start = time.perf_counter()
+    worst = 0.0
+    for i in range(frames):
+        busy(work)
+        frame_start = time.perf_counter()
+        write(source[i % len(source)])
+        worst = max(worst, time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+    return {'loop_fps': frames / elapsed, 'worst_write_ms': worst * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], metavar=('W', 'H'))
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--work-ms', type=float, default=15.0, help="simulated detector time per frame")
+    parser.add_argument('--fourcc', default='mp4v')
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--output', help="JSON output path (default: stdout)")
+    args = parser.parse_args()
+
+    w, h = args.size
+    rng = np.random.default_rng(0)
+    source = [rng.integers(0, 255, (h, w, 3), dtype=np.uint8) for _ in range(4)]
+    work = args.work_ms / 1000
+    directory = tempfile.mkdtemp(prefix='video-')
+    runs = {}
+    try:
+        runs['none'] = run(lambda frame: None, args.frames, source, work)
+
+        writer = cv2.VideoWriter(os.path.join(directory, 'inline.mp4'),
+                                 cv2.VideoWriter_fourcc(*args.fourcc), 30, (w, h))
+        runs['inline'] = run(writer.write, args.frames, source, work)
+        writer.release()
+        runs['inline']['encoded'] = args.frames
+
+        for policy in DROP_POLICIES:
+            recorder = VideoRecorder(os.path.join(directory, f"{policy}.mp4"), 30,
+                                     args.queue, policy, args.fourcc)
+            runs[f"drop-{policy}"] = run(recorder.write, args.frames, source, work)
+            recorder.close()
+            runs[f"drop-{policy}"].update(encoded=recorder.encoded, dropped=recorder.dropped)
+    finally:
+        shutil.rmtree(directory)
+
+    for name, stats in runs.items():
+        print(f"{name}: {stats['loop_fps']:.1f} fps", file=sys.stderr)
+    results = {'size': args.size, 'work_ms': args.work_ms, 'queue': args.queue, 'runs': runs}
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Crowd mode: run one detector per overlapping tile so small, distant faces are found.
+
+The face detector inside FaceMesh looks at a downscaled copy of its whole
+input, so a distant face in a wide frame shrinks to a few pixels and is
+missed. Tiling gives each detector a smaller field of view at the same
+input size. Every tile keeps its own instance (FaceMesh tracks faces
+between frames, so a tile must always go to the same one) and tiles run
+concurrently on a thread pool; MediaPipe releases the GIL while it works.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from detector_backends import ArrayLandmarks, DetectionResults, Landmark, SparseLandmarks
+
+TILE_OVERLAP = 0.25     # Fraction of a tile shared with each neighbour
+DUPLICATE_IOU = 0.3     # Boxes overlapping more than this are the same face
+
+
+def tile_boxes(width, height, cols, rows, overlap=TILE_OVERLAP):
+    """Pixel boxes (x0, y0, x1, y1) covering the frame, each grown into its neighbours"""
+    step_x, step_y = width / cols, height / rows
+    pad_x, pad_y = step_x * overlap / 2, step_y * overlap / 2
+    boxes = []
+    for row in range(rows):
+        for col in range(cols):
+            boxes.append((int(max(0, col * step_x - pad_x)),
+                          int(max(0, row * step_y - pad_y)),
+                          int(min(width, (col + 1) * step_x + pad_x)),
+                          int(min(height, (row + 1) * step_y + pad_y))))
+    return boxes
+
+
+def _remap(face, box, width, height):
+    """Tile-normalised landmarks to frame-normalised ones"""
+    x0, y0, x1, y1 = box
+    sx, sy = (x1 - x0) / width, (y1 - y0) / height
+    ox, oy = x0 / width, y0 / height
+    if isinstance(face.landmark, dict):
+        return SparseLandmarks({i: Landmark(ox + p.x * sx, oy + p.y * sy, p.z * sx)
+                                for i, p in face.landmark.items()})
+    points = np.array([(p.x, p.y, p.z) for p in face.landmark], dtype=np.float32)
+    points *= (sx, sy, sx)   # z is in units of the input width
+    points[:, 0] += ox
+    points[:, 1] += oy
+    return ArrayLandmarks(points)
+
+
+def _bounds(face):
+    if isinstance(face, ArrayLandmarks):
+        points = face.points
+        return points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()
+    xs = [p.x for p in face.landmark.values()]
+    ys = [p.y for p in face.landmark.values()]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _edge_margin(bounds, tile):
+    # Distance from the face to the nearest tile edge; faces cut by a seam sit at zero
+    return min(bounds[0] - tile[0], bounds[1] - tile[1], tile[2] - bounds[2], tile[3] - bounds[3])
+
+
+class TiledDetector:
+    """A detector backend that runs make_backend() instances over a grid of tiles.
+
+    Faces seen by two tiles in their overlap are merged, keeping the copy
+    farthest from its tile's edges, which is the one least likely cut off.
+    Each tile may find max_faces, so the merged faces are capped at
+    max_faces again, best placed first.
+    """
+
+    def __init__(self, make_backend, cols=2, rows=2, overlap=TILE_OVERLAP, workers=None, max_faces=None):
+        self.cols = cols
+        self.rows = rows
+        self.overlap = overlap
+        self.max_faces = max_faces
+        self.backends = [make_backend() for _ in range(cols * rows)]
+        self.name = f"{self.backends[0].name} x{cols * rows} tiles"
+        self.provides = self.backends[0].provides
+        self.workers = workers or min(len(self.backends), os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.boxes = None
+        self.shape = None
+        self.duplicates = 0
+
+    def _run_tile(self, index, rgb):
+        x0, y0, x1, y1 = self.boxes[index]
+        # FaceMesh wants a contiguous image
+        tile = np.ascontiguousarray(rgb[y0:y1, x0:x1])
+        return self.backends[index].process(tile).multi_face_landmarks or []
+
+    def process(self, rgb):
+        height, width = rgb.shape[:2]
+        if self.shape != (height, width):
+            self.shape = (height, width)
+            self.boxes = tile_boxes(width, height, self.cols, self.rows, self.overlap)
+
+        futures = [self.executor.submit(self._run_tile, i, rgb) for i in range(len(self.backends))]
+        candidates = []
+        for index, future in enumerate(futures):
+            x0, y0, x1, y1 = self.boxes[index]
+            tile = (x0 / width, y0 / height, x1 / width, y1 / height)
+            for face in future.result():
+                face = _remap(face, self.boxes[index], width, height)
+                bounds = _bounds(face)
+                candidates.append((_edge_margin(bounds, tile), bounds, face))
+
+        # Best placed copies first, then drop anything overlapping a face already kept
+        candidates.sort(key=lambda c: c[0], reverse=True)
+        kept = []
+        for margin, bounds, face in candidates:
+            if any(_iou(bounds, other) > DUPLICATE_IOU for _, other, _ in kept):
+                self.duplicates += 1
+                continue
+            kept.append((margin, bounds, face))
+
+        # Identity across frames is up to the caller (head_tracking.FaceTracks), not this order
+        return DetectionResults([face for _, _, face in kept[:self.max_faces]])
+
+    def close(self):
+        self.executor.shutdown()
+        for backend in self.backends:
+            backend.close()
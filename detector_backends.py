@@ -0,0 +1,240 @@
+"""Interchangeable face detector backends behind the FaceMesh result shape.
+
+Every backend's process(rgb) returns an object with multi_face_landmarks:
+None when no face was found, else one entry per face whose .landmark[i]
+has normalised x, y, z at FaceMesh index i. Backends that aren't a mesh
+only fill in the indices listed in their `provides`; several of those are
+estimated from a bounding box, which is plenty for steering a paddle but
+not for drawing a face outline.
+
+Apps declare the landmark indices they read and select_backend() picks the
+cheapest available backend covering them.
+"""
+import os
+
+import cv2
+
+try:
+    import mediapipe as mp
+except ImportError:
+    mp = None
+
+MESH_LANDMARKS = frozenset(range(468))
+REFINED_MESH_LANDMARKS = frozenset(range(478))   # Adds the iris points
+
+# FaceMesh indices standing in for the short-range detector's six keypoints
+# (subject's right eye, left eye, nose tip, mouth centre, right ear, left ear)
+DETECTION_KEYPOINTS = (468, 473, 1, 13, 234, 454)
+# Box edge midpoints: top of forehead and bottom of chin
+BOX_TOP = 10
+BOX_BOTTOM = 152
+BOX_LEFT = 234
+BOX_RIGHT = 454
+NOSE_TIP = 1
+NOSE_HEIGHT = 0.6       # Nose tip as a fraction of the way down a face box
+
+
+class Landmark:
+    __slots__ = ('x', 'y', 'z')
+
+    def __init__(self, x, y, z=0.0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class SparseLandmarks:
+    """Stand-in for a FaceMesh landmark list holding only some indices"""
+
+    def __init__(self, points):
+        self.landmark = points
+
+
+class ArrayLandmarks:
+    """FaceMesh-shaped landmarks backed by an (N, 3) array of normalised x, y, z"""
+
+    def __init__(self, points):
+        self.points = points
+        self.landmark = self
+
+    def __getitem__(self, index):
+        x, y, z = self.points[index]
+        return Landmark(float(x), float(y), float(z))
+
+    def __len__(self):
+        return len(self.points)
+
+
+class DetectionResults:
+    def __init__(self, faces):
+        self.multi_face_landmarks = faces or None
+
+
+def box_landmarks(x0, y0, x1, y1):
+    """Landmarks estimated from a normalised face box"""
+    cx = (x0 + x1) / 2
+    cy = (y0 + y1) / 2
+    return {
+        BOX_TOP: Landmark(cx, y0),
+        BOX_BOTTOM: Landmark(cx, y1),
+        BOX_LEFT: Landmark(x0, cy),
+        BOX_RIGHT: Landmark(x1, cy),
+        NOSE_TIP: Landmark(cx, y0 + (y1 - y0) * NOSE_HEIGHT),
+    }
+
+
+class FaceMeshBackend:
+    name = 'mesh'
+    cost = 3              # Relative per-frame cost, used to rank backends
+    provides = MESH_LANDMARKS
+    refine = False
+
+    def __init__(self, max_faces=1, detection_confidence=0.5, tracking_confidence=0.5):
+        self.mesh = mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=max_faces,
+            refine_landmarks=self.refine,
+            min_detection_confidence=detection_confidence,
+            min_tracking_confidence=tracking_confidence
+        )
+
+    @classmethod
+    def available(cls):
+        return mp is not None and hasattr(mp, 'solutions')
+
+    def process(self, rgb):
+        return self.mesh.process(rgb)
+
+    def close(self):
+        self.mesh.close()
+
+
+class RefinedFaceMeshBackend(FaceMeshBackend):
+    name = 'mesh-refine'
+    cost = 4
+    provides = REFINED_MESH_LANDMARKS
+    refine = True
+
+
+class FaceDetectionBackend:
+    """MediaPipe short-range face detector: six keypoints plus the box"""
+    name = 'detection'
+    cost = 1
+    provides = frozenset(DETECTION_KEYPOINTS) | {BOX_TOP, BOX_BOTTOM}
+
+    def __init__(self, max_faces=1, detection_confidence=0.5, tracking_confidence=0.5):
+        self.max_faces = max_faces
+        self.detector = mp.solutions.face_detection.FaceDetection(
+            model_selection=0,
+            min_detection_confidence=detection_confidence
+        )
+
+    @classmethod
+    def available(cls):
+        return mp is not None and hasattr(mp, 'solutions')
+
+    def process(self, rgb):
+        results = self.detector.process(rgb)
+        faces = []
+        for detection in (results.detections or [])[:self.max_faces]:
+            data = detection.location_data
+            box = data.relative_bounding_box
+            points = box_landmarks(box.xmin, box.ymin, box.xmin + box.width, box.ymin + box.height)
+            for index, keypoint in zip(DETECTION_KEYPOINTS, data.relative_keypoints):
+                points[index] = Landmark(keypoint.x, keypoint.y)
+            faces.append(SparseLandmarks(points))
+        return DetectionResults(faces)
+
+    def close(self):
+        self.detector.close()
+
+
+class HaarBackend:
+    """OpenCV's frontal Haar cascade, the detector face_db.py uses; box landmarks only"""
+    name = 'haar'
+    cost = 2
+    provides = frozenset((BOX_TOP, BOX_BOTTOM, BOX_LEFT, BOX_RIGHT, NOSE_TIP))
+    path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+    def __init__(self, max_faces=1, detection_confidence=0.5, tracking_confidence=0.5):
+        self.max_faces = max_faces
+        self.cascade = cv2.CascadeClassifier(self.path)
+
+    @classmethod
+    def available(cls):
+        return os.path.exists(cls.path)
+
+    def process(self, rgb):
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        h, w = gray.shape
+        boxes = self.cascade.detectMultiScale(gray, 1.3, 5, minSize=(60, 60))
+        # Largest faces first, as the closest players are the ones playing
+        boxes = sorted(boxes, key=lambda b: b[2] * b[3], reverse=True)[:self.max_faces]
+        faces = [SparseLandmarks(box_landmarks(x / w, y / h, (x + bw) / w, (y + bh) / h))
+                 for x, y, bw, bh in boxes]
+        return DetectionResults(faces)
+
+    def close(self):
+        pass
+
+
+class CascadeBackend:
+    """Runs a cheap detector every frame and the expensive one only when it sees a face"""
+
+    def __init__(self, gate, backend):
+        self.gate = gate
+        self.backend = backend
+        self.name = f"{gate.name}+{backend.name}"
+        self.cost = backend.cost
+        self.provides = backend.provides
+        self.frames = 0
+        self.backend_runs = 0
+
+    def process(self, rgb):
+        self.frames += 1
+        if not self.gate.process(rgb).multi_face_landmarks:
+            return DetectionResults(None)
+        self.backend_runs += 1
+        return self.backend.process(rgb)
+
+    @property
+    def runs_avoided(self):
+        return self.frames - self.backend_runs
+
+    def close(self):
+        self.gate.close()
+        self.backend.close()
+
+
+BACKENDS = {cls.name: cls for cls in (FaceDetectionBackend, HaarBackend,
+                                      FaceMeshBackend, RefinedFaceMeshBackend)}
+BACKEND_CHOICES = ('auto',) + tuple(BACKENDS)
+
+
+def select_backend(required, name='auto', cascade=False, max_faces=1,
+                   detection_confidence=0.5, tracking_confidence=0.5):
+    """Backend for the given landmark indices: the named one, or the cheapest that provides them.
+
+    With cascade=True a more expensive backend is gated by the cheapest
+    available one, so it only runs on frames that contain a face.
+    """
+    required = frozenset(required)
+    if name == 'auto':
+        candidates = sorted((cls for cls in BACKENDS.values()
+                             if required <= cls.provides and cls.available()),
+                            key=lambda cls: cls.cost)
+        if not candidates:
+            raise RuntimeError(f"no available detector provides landmarks {sorted(required)}")
+        chosen = candidates[0]
+    else:
+        chosen = BACKENDS[name]
+        missing = required - chosen.provides
+        if missing:
+            raise ValueError(f"{name} backend lacks landmarks {sorted(missing)}")
+
+    backend = chosen(max_faces, detection_confidence, tracking_confidence)
+    if cascade:
+        gates = sorted((cls for cls in BACKENDS.values() if cls.cost < chosen.cost and cls.available()),
+                       key=lambda cls: cls.cost)
+        if gates:
+            backend = CascadeBackend(gates[0](max_faces, detection_confidence), backend)
+    return backend
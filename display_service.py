@@ -0,0 +1,150 @@
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from frame_trace import Tracer
+
+DISPLAY_FPS = 60        # Main window refresh, roughly the monitor's vsync
+SECONDARY_FPS = 10      # Default for auxiliary views like the players' camera feed
+
+
+class _Window:
+    def __init__(self, name, fps):
+        self.name = name
+        self.interval = 1.0 / fps
+        self.pending = None      # Latest frame handed over by the producer
+        self.shown = None        # Buffer HighGUI is displaying; swapped with pending
+        self.dirty = False
+        self.stamp = None
+        self.last_shown = -np.inf
+        self.latency = None      # Stamp-to-imshow time of the last presented frame
+        self.presented = None    # (stamp, imshow time) of the last presented frame
+
+
+class DisplayService:
+    """Owns every HighGUI call: shows the newest frame per window and queues key presses.
+
+    Producers call show(), which copies the frame into a per-window buffer and
+    returns immediately; frames that arrive faster than a window's rate simply
+    replace each other. Keys come back through keys(), so no press is lost to
+    a second waitKey. With threaded=False nothing runs in the background and
+    the caller drives pump() itself (HighGUI on macOS wants the main thread).
+    """
+
+    def __init__(self, fps=DISPLAY_FPS, threaded=True, tracer=None):
+        self.interval = 1.0 / fps
+        self.threaded = threaded
+        self.tracer = tracer or Tracer()
+        self.windows = {}
+        self.lock = threading.Lock()
+        self.key_queue = queue.Queue()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.frames_shown = 0
+        self.frames_skipped = 0
+
+    def add_window(self, name, fps=None):
+        with self.lock:
+            self.windows[name] = _Window(name, fps or 1.0 / self.interval)
+
+    def start(self):
+        if self.threaded and self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="display", daemon=True)
+            self.thread.start()
+        return self
+
+    def due(self, name, now=None):
+        """Whether a frame for this window would be shown; lets callers skip composing it"""
+        window = self.windows[name]
+        now = time.perf_counter() if now is None else now
+        return self._elapsed(window, now)
+
+    def show(self, name, frame, stamp=None):
+        """Hand over a frame without waiting on HighGUI; returns False if the window isn't due"""
+        if name not in self.windows:
+            self.add_window(name)
+        window = self.windows[name]
+        if not self.due(name):
+            return False
+
+        with self.lock:
+            if window.dirty:
+                self.frames_skipped += 1
+            if window.pending is None or window.pending.shape != frame.shape:
+                window.pending = np.empty_like(frame)
+            np.copyto(window.pending, frame)
+            window.stamp = stamp
+            window.dirty = True
+        return True
+
+    def keys(self):
+        """Key codes pressed since the last call, oldest first"""
+        pressed = []
+        while True:
+            try:
+                pressed.append(self.key_queue.get_nowait())
+            except queue.Empty:
+                return pressed
+
+    def latency(self, name):
+        """Seconds from the stamp passed to show() to the frame reaching imshow"""
+        window = self.windows.get(name)
+        return None if window is None else window.latency
+
+    def presented(self, name):
+        """(stamp, imshow time) of the last frame actually shown, which may predate the last show()"""
+        window = self.windows.get(name)
+        return None if window is None else window.presented
+
+    def _elapsed(self, window, now):
+        # Half a tick of slack so sleep jitter doesn't make a window skip every other tick
+        return now - window.last_shown >= window.interval - self.interval / 2
+
+    def pump(self):
+        """Present due frames and poll the keyboard once"""
+        self.tracer.stage('display')
+        now = time.perf_counter()
+        with self.lock:
+            ready = []
+            for window in self.windows.values():
+                if window.dirty and self._elapsed(window, now):
+                    window.pending, window.shown = window.shown, window.pending
+                    window.dirty = False
+                    window.last_shown = now
+                    ready.append((window, window.stamp))
+
+        for window, stamp in ready:
+            cv2.imshow(window.name, window.shown)
+            if stamp is not None:
+                shown_at = time.perf_counter()
+                window.latency = shown_at - stamp
+                window.presented = (stamp, shown_at)
+            self.frames_shown += 1
+
+        key = cv2.waitKey(1)
+        if key != -1:
+            self.key_queue.put(key & 0xFF)
+        self.tracer.end()
+
+    def _run(self):
+        next_tick = time.perf_counter()
+        while not self.stop_event.is_set():
+            self.pump()
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()   # Fell behind; don't try to catch up
+        cv2.destroyAllWindows()
+
+    def close(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        else:
+            cv2.destroyAllWindows()
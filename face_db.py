@@ -1,66 +1,210 @@
 import os
+import threading
+import time
 import cv2
-import numpy as np
+from face_index import FaceIndex, FACE_SIZE, lbp_feature
+from face_quality import FaceQualityGate
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+HAAR_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# Distance below which a face counts as friendly, per matching metric
+MATCH_THRESHOLDS = {
+    # An estimate, not calibrated on faces: uniform LBP merges LBPH's 256
+    # bins into 59, and mapping distances between the two on non-face sample
+    # images puts the old LBPH cut-off of 70 at about 45 here
+    'chi2': 45,
+    'cosine': 0.25,
+}
+
 
 class FaceDatabase:
-    def __init__(self, friendly_dir="friendly", cache_duration=1.0):
+    def __init__(self, friendly_dir="friendly", cache_duration=1.0, metric="chi2",
+                 match_threshold=None, coarse_clusters="auto"):
         self.friendly_dir = friendly_dir
-        self.face_detector = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.face_recognizer = cv2.face.LBPHFaceRecognizer_create()
-        self.friendly_faces = []
+        self.face_detector = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
+        self._local = threading.local()
+        self.metric = metric
+        self.coarse_clusters = coarse_clusters
+        self.face_index = FaceIndex(metric=metric, coarse_clusters=coarse_clusters)
+        self.match_threshold = MATCH_THRESHOLDS[metric] if match_threshold is None else match_threshold
         self.face_cache = {}
         self.cache_duration = cache_duration
         self.min_face_size = (60, 60)
-        self.trained = False
+        self.quality_gate = FaceQualityGate(min_size=self.min_face_size)
+        self.feature_cache = {}   # image path -> (mtime, feature)
+        self.reload_lock = threading.Lock()
         self.load_friendly_faces()
-        
+
+    # The index is replaced as a whole on reload, so readers see either the
+    # old model or the new one, never a half-built mix
+    @property
+    def trained(self):
+        return len(self.face_index) > 0
+
+    @property
+    def identities(self):
+        return self.face_index.names
+
     @property
     def friendly_embeddings(self):
-        return {str(i): face for i, face in enumerate(self.friendly_faces)}
+        return self.face_index.embeddings
 
-    def load_friendly_faces(self):
+    def scan_friendly_dir(self):
+        """Map identity name -> image paths; subdirectories are people, loose files are their own identity"""
+        gallery = {}
+        for entry in sorted(os.listdir(self.friendly_dir)):
+            path = os.path.join(self.friendly_dir, entry)
+            if os.path.isdir(path):
+                images = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                          if f.lower().endswith(IMAGE_EXTENSIONS)]
+                if images:
+                    gallery[entry] = images
+            elif entry.lower().endswith(IMAGE_EXTENSIONS):
+                gallery[os.path.splitext(entry)[0]] = [path]
+        return gallery
+
+    def snapshot(self):
+        """Modification times of every gallery image, used to detect changes"""
         if not os.path.exists(self.friendly_dir):
-            os.makedirs(self.friendly_dir)
-            return
-
-        faces = []
-        labels = []
-        label = 0
-
-        for img_file in os.listdir(self.friendly_dir):
-            if img_file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                img_path = os.path.join(self.friendly_dir, img_file)
-                img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                if img is not None:
-                    faces.append(img)
-                    labels.append(label)
-                    label += 1
-
-        if faces:
-            self.friendly_faces = faces
-            try:
-                faces_resized = [cv2.resize(face, (100, 100)) for face in faces]
-                self.face_recognizer.train(faces_resized, np.array(labels))
-                self.trained = True
-            except Exception as e:
-                self.trained = False
+            return {}
+        snap = {}
+        for paths in self.scan_friendly_dir().values():
+            for img_path in paths:
+                try:
+                    snap[img_path] = os.stat(img_path).st_mtime
+                except OSError:
+                    pass
+        return snap
+
+    def _image_feature(self, img_path, mtime):
+        # Only new or modified images pay for decoding and LBP extraction
+        cached = self.feature_cache.get(img_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
+        feature = None if img is None else lbp_feature(cv2.resize(img, FACE_SIZE))
+        self.feature_cache[img_path] = (mtime, feature)
+        return feature
+
+    def load_friendly_faces(self):
+        with self.reload_lock:
+            if not os.path.exists(self.friendly_dir):
+                # Deleted or never created: nobody is friendly until images are added
+                os.makedirs(self.friendly_dir)
+                self.feature_cache.clear()
+                self.face_index = FaceIndex(metric=self.metric, coarse_clusters=self.coarse_clusters)
+                return {}
+
+            snap = self.snapshot()
+            gallery = {}
+            for name, paths in self.scan_friendly_dir().items():
+                feats = []
+                for img_path in paths:
+                    if img_path not in snap:
+                        continue
+                    feature = self._image_feature(img_path, snap[img_path])
+                    if feature is not None:
+                        feats.append(feature)
+                if feats:
+                    gallery[name] = feats
 
-    def is_friendly(self, face_img, face_id=None):
-        if not self.trained or not self.friendly_faces:
-            return False
+            # Drop features of images that were removed
+            for img_path in list(self.feature_cache):
+                if img_path not in snap:
+                    del self.feature_cache[img_path]
+
+            index = FaceIndex(metric=self.metric, coarse_clusters=self.coarse_clusters)
+            index.build(gallery)
+            self.face_index = index
+            return snap
+
+    def watch(self, interval=2.0, log=None):
+        """Start a background watcher that reloads the gallery when friendly_dir changes"""
+        watcher = FriendlyDirWatcher(self, interval, log)
+        watcher.start()
+        return watcher
+
+    def _thread_detector(self):
+        # CascadeClassifier keeps scratch buffers, so worker threads each get their own
+        if threading.current_thread() is threading.main_thread():
+            return self.face_detector
+        detector = getattr(self._local, 'face_detector', None)
+        if detector is None:
+            detector = cv2.CascadeClassifier(HAAR_CASCADE_PATH)
+            self._local.face_detector = detector
+        return detector
+
+    def _match_gray(self, index, gray):
+        faces = self._thread_detector().detectMultiScale(gray, 1.3, 5, minSize=self.min_face_size)
+
+        if len(faces) > 0:
+            (x, y, w, h) = faces[0]
+            face_roi = gray[y:y+h, x:x+w]
+            face_roi = cv2.resize(face_roi, FACE_SIZE)
+            return index.search(lbp_feature(face_roi))
+        return None, None
+
+    def _gated_match(self, face_img, pose):
+        """(name, distance) for a BGR crop, (None, None) on no match, or None when the quality gate skipped it"""
+        index = self.face_index
+        if not len(index):
+            return None, None
 
         try:
             gray = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
-            faces = self.face_detector.detectMultiScale(gray, 1.3, 5)
-            
-            if len(faces) > 0:
-                (x, y, w, h) = faces[0]
-                face_roi = gray[y:y+h, x:x+w]
-                face_roi = cv2.resize(face_roi, (100, 100))
-                
-                label, confidence = self.face_recognizer.predict(face_roi)
-                return confidence < 70  # Lower confidence is better match
+            if not self.quality_gate.check(gray, pose):
+                return None
+            return self._match_gray(index, gray)
         except Exception:
-            pass
-            
-        return False
+            return None, None
+
+    def match(self, face_img, pose=None):
+        """Best matching identity and distance for a BGR crop, or (None, None)"""
+        result = self._gated_match(face_img, pose)
+        return (None, None) if result is None else result
+
+    def is_friendly(self, face_img, face_id=None, pose=None):
+        """True/False for a BGR crop, or None when the quality gate skipped the prediction.
+
+        pose is an optional (yaw, roll) in degrees, see face_quality.pose_from_landmarks.
+        """
+        result = self._gated_match(face_img, pose)
+        if result is None:
+            return None
+        name, distance = result
+        return name is not None and distance < self.match_threshold  # Lower distance is better match
+
+
+class FriendlyDirWatcher(threading.Thread):
+    """Polls friendly_dir mtimes and retrains the FaceDatabase in the background"""
+
+    def __init__(self, face_db, interval=2.0, log=None):
+        super().__init__(daemon=True)
+        self.face_db = face_db
+        self.interval = interval
+        self.log = log
+        self.reloads = 0
+        self.last_reload_seconds = None
+        self.last_error = None
+        self.stop_event = threading.Event()
+        self.known = face_db.snapshot()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                current = self.face_db.snapshot()
+                if current != self.known:
+                    started = time.perf_counter()
+                    self.known = self.face_db.load_friendly_faces()
+                    self.last_reload_seconds = time.perf_counter() - started
+                    self.reloads += 1
+                    if self.log is not None:
+                        self.log(f"Reloaded {len(self.face_db.identities)} friendly identities "
+                                 f"in {self.last_reload_seconds:.2f}s")
+            except Exception as e:
+                self.last_error = e
+
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=self.interval + 1.0)
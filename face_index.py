@@ -0,0 +1,232 @@
+import numpy as np
+
+# LBP settings mirror OpenCV's LBPH defaults (radius 1, 8 neighbours, 8x8 grid)
+LBP_RADIUS = 1
+LBP_NEIGHBORS = 8
+LBP_GRID = (8, 8)
+FACE_SIZE = (100, 100)
+
+# Rows scored per block so the chi-square temporaries stay small
+SEARCH_BLOCK_ROWS = 2048
+# Galleries at least this big get a coarse index when clusters are "auto"
+AUTO_COARSE_MIN_ROWS = 1024
+
+
+def _uniform_lookup():
+    """Map the 256 LBP codes onto 58 uniform patterns plus one catch-all bin"""
+    table = np.full(256, 58, dtype=np.uint8)
+    next_bin = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transitions <= 2:
+            table[code] = next_bin
+            next_bin += 1
+    return table
+
+
+UNIFORM_LOOKUP = _uniform_lookup()
+# Fewer bins than LBPH's 256, so distances are not on the LBPH confidence scale
+LBP_BINS = 59
+FEATURE_DIM = LBP_GRID[0] * LBP_GRID[1] * LBP_BINS
+
+_cell_maps = {}
+
+
+def _cell_map(shape):
+    """Cell index of every pixel in an LBP image of the given shape"""
+    if shape not in _cell_maps:
+        h, w = shape
+        rows = (np.arange(h) * LBP_GRID[0]) // h
+        cols = (np.arange(w) * LBP_GRID[1]) // w
+        cells = rows[:, None] * LBP_GRID[1] + cols[None, :]
+        counts = np.bincount(cells.ravel(), minlength=LBP_GRID[0] * LBP_GRID[1])
+        _cell_maps[shape] = (cells.astype(np.int32) * LBP_BINS, counts.astype(np.float32))
+    return _cell_maps[shape]
+
+
+def lbp_codes(gray):
+    """Circular LBP codes with bilinear sampling, as computed by OpenCV's LBPH"""
+    img = gray.astype(np.float32)
+    h, w = img.shape
+    r = LBP_RADIUS
+    center = img[r:h-r, r:w-r]
+    codes = np.zeros(center.shape, dtype=np.uint8)
+    for n in range(LBP_NEIGHBORS):
+        x = r * np.cos(2.0 * np.pi * n / LBP_NEIGHBORS)
+        y = -r * np.sin(2.0 * np.pi * n / LBP_NEIGHBORS)
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        tx, ty = x - fx, y - fy
+        w1 = (1 - tx) * (1 - ty)
+        w2 = tx * (1 - ty)
+        w3 = (1 - tx) * ty
+        w4 = tx * ty
+        sample = (w1 * img[r+fy:h-r+fy, r+fx:w-r+fx] +
+                  w2 * img[r+fy:h-r+fy, r+cx:w-r+cx] +
+                  w3 * img[r+cy:h-r+cy, r+fx:w-r+fx] +
+                  w4 * img[r+cy:h-r+cy, r+cx:w-r+cx])
+        bit = (sample > center) | (np.abs(sample - center) < np.finfo(np.float32).eps)
+        codes |= bit.astype(np.uint8) << n
+    return codes
+
+
+def lbp_feature(gray):
+    """Spatial uniform-LBP histogram of a grayscale face, one normalised histogram per cell"""
+    codes = UNIFORM_LOOKUP[lbp_codes(gray)]
+    offsets, counts = _cell_map(codes.shape)
+    hist = np.bincount((offsets + codes).ravel(), minlength=FEATURE_DIM).astype(np.float32)
+    hist = hist.reshape(-1, LBP_BINS)
+    hist /= counts[:, None]
+    return hist.ravel()
+
+
+def _unit_rows(features):
+    # Hellinger mapping turns cosine similarity into a sensible histogram distance
+    unit = np.sqrt(features)
+    norms = np.linalg.norm(unit, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    unit /= norms
+    return unit
+
+
+class FaceIndex:
+    """Array-backed gallery of face feature vectors grouped by identity"""
+
+    def __init__(self, metric="chi2", coarse_clusters="auto", probe_clusters=4):
+        if metric not in ("chi2", "cosine"):
+            raise ValueError(f"Unknown metric: {metric}")
+        self.metric = metric
+        self.coarse_clusters = coarse_clusters
+        self.probe_clusters = probe_clusters
+        self.names = []
+        self.features = np.empty((0, FEATURE_DIM), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int32)
+        self.unit = None
+        self.centroids = None
+        self.cluster_rows = []
+        self.embeddings = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def build(self, gallery):
+        """Build the index from a mapping of identity name -> list of feature vectors"""
+        self.names = sorted(name for name, feats in gallery.items() if len(feats))
+        total = sum(len(gallery[name]) for name in self.names)
+
+        # One contiguous matrix, rows grouped by identity
+        self.features = np.empty((total, FEATURE_DIM), dtype=np.float32)
+        self.labels = np.empty(total, dtype=np.int32)
+        row = 0
+        for label, name in enumerate(self.names):
+            feats = gallery[name]
+            self.features[row:row + len(feats)] = feats
+            self.labels[row:row + len(feats)] = label
+            row += len(feats)
+
+        self.unit = _unit_rows(self.features.copy()) if total else None
+        # Zero-copy views into the gallery matrix, one per identity
+        self.embeddings = {name: self.features[self.identity_rows(label)]
+                           for label, name in enumerate(self.names)}
+        self._build_coarse_index()
+
+    def identity_rows(self, label):
+        """Slice of gallery rows belonging to one identity (rows are grouped)"""
+        start = np.searchsorted(self.labels, label, side='left')
+        end = np.searchsorted(self.labels, label, side='right')
+        return slice(int(start), int(end))
+
+    def _build_coarse_index(self):
+        self.centroids = None
+        self.cluster_rows = []
+
+        n_clusters = self.coarse_clusters
+        if n_clusters == "auto":
+            n_clusters = int(np.sqrt(len(self))) if len(self) >= AUTO_COARSE_MIN_ROWS else 0
+        if not n_clusters or n_clusters >= len(self):
+            return
+
+        # Spherical k-means on the unit vectors, seeded for repeatable builds
+        rng = np.random.default_rng(0)
+        centroids = self.unit[rng.choice(len(self), n_clusters, replace=False)].copy()
+        for _ in range(10):
+            assign = np.argmax(self.unit @ centroids.T, axis=1)
+            for c in range(n_clusters):
+                members = self.unit[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assign = np.argmax(self.unit @ centroids.T, axis=1)
+        # Duplicate seeds (identical gallery images) leave clusters nobody lands in
+        used = np.unique(assign)
+        self.centroids = centroids[used]
+        self.cluster_rows = [np.flatnonzero(assign == c) for c in used]
+
+    def _candidate_rows(self, query_unit):
+        if self.centroids is None:
+            return None
+        probes = min(self.probe_clusters, len(self.centroids))
+        sims = self.centroids @ query_unit
+        nearest = np.argpartition(-sims, probes - 1)[:probes]
+        rows = np.concatenate([self.cluster_rows[c] for c in nearest])
+        return rows if len(rows) else None   # Fall back to an exhaustive search
+
+    def _chi2(self, rows, query):
+        distances = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SEARCH_BLOCK_ROWS):
+            block = rows[start:start + SEARCH_BLOCK_ROWS]
+            diff = block - query
+            total = block + query
+            total += 1e-12  # Bins empty on both sides give 0 / eps = 0
+            np.square(diff, out=diff)
+            diff /= total
+            distances[start:start + len(block)] = 2.0 * diff.sum(axis=1)
+        return distances
+
+    def distances(self, feature):
+        """Distances from one feature vector to the gallery (or its probed subset)"""
+        query = np.asarray(feature, dtype=np.float32)
+        query_unit = _unit_rows(query[None, :].copy())[0]
+        candidates = self._candidate_rows(query_unit)
+
+        if self.metric == "cosine":
+            unit = self.unit if candidates is None else self.unit[candidates]
+            dist = 1.0 - unit @ query_unit
+        else:
+            rows = self.features if candidates is None else self.features[candidates]
+            dist = self._chi2(rows, query)
+
+        labels = self.labels if candidates is None else self.labels[candidates]
+        return dist, labels
+
+    def search(self, feature):
+        """Closest identity name and its distance, or (None, None) for an empty index"""
+        if not len(self):
+            return None, None
+        dist, labels = self.distances(feature)
+        best = int(np.argmin(dist))
+        return self.names[labels[best]], float(dist[best])
+
+    def search_batch(self, features):
+        """search() for a stack of feature vectors; one matrix product for exhaustive cosine"""
+        if not len(self):
+            return [(None, None)] * len(features)
+        if self.metric != "cosine" or self.centroids is not None:
+            return [self.search(feature) for feature in features]
+
+        queries = _unit_rows(np.array(features, dtype=np.float32))
+        dist = 1.0 - queries @ self.unit.T
+        best = np.argmin(dist, axis=1)
+        return [(self.names[self.labels[b]], float(dist[i, b])) for i, b in enumerate(best)]
+
+    @property
+    def nbytes(self):
+        """Memory held by the gallery arrays"""
+        total = self.features.nbytes + self.labels.nbytes
+        if self.unit is not None:
+            total += self.unit.nbytes
+        if self.centroids is not None:
+            total += self.centroids.nbytes + sum(rows.nbytes for rows in self.cluster_rows)
+        return total
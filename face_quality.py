@@ -0,0 +1,93 @@
+import threading
+
+import cv2
+import numpy as np
+
+# FaceMesh landmarks used for the pose estimate
+POSE_LANDMARKS = {
+    'left_eye': 33,     # Outer corner of the eye on the image left
+    'right_eye': 263,   # Outer corner of the eye on the image right
+    'nose': 1           # Nose tip
+}
+
+
+def pose_from_landmarks(landmarks, frame_w, frame_h):
+    """Rough (yaw, roll) in degrees from FaceMesh landmarks"""
+    left = landmarks.landmark[POSE_LANDMARKS['left_eye']]
+    right = landmarks.landmark[POSE_LANDMARKS['right_eye']]
+    nose = landmarks.landmark[POSE_LANDMARKS['nose']]
+
+    dx = (right.x - left.x) * frame_w
+    dy = (right.y - left.y) * frame_h
+    eye_dist = np.hypot(dx, dy)
+    if eye_dist == 0:
+        return 90.0, 0.0
+
+    # Roll is the tilt of the eye line
+    roll = np.degrees(np.arctan2(dy, dx))
+
+    # Yaw from how far the nose sits off the eye midpoint, along the eye line
+    mid_x = (left.x + right.x) / 2 * frame_w
+    mid_y = (left.y + right.y) / 2 * frame_h
+    offset = ((nose.x * frame_w - mid_x) * dx + (nose.y * frame_h - mid_y) * dy) / eye_dist
+    yaw = np.degrees(np.arcsin(np.clip(2 * offset / eye_dist, -1.0, 1.0)))
+    return float(yaw), float(roll)
+
+
+class FaceQualityGate:
+    """Cheap checks that reject crops LBP matching would almost certainly fail on"""
+
+    def __init__(self, min_size=(60, 60), min_sharpness=50.0, max_yaw=30.0, max_roll=25.0):
+        self.min_size = min_size
+        self.min_sharpness = min_sharpness
+        self.max_yaw = max_yaw
+        self.max_roll = max_roll
+        self.lock = threading.Lock()   # Recognition workers share one gate
+        self.checked = 0
+        self.rejected_size = 0
+        self.rejected_blur = 0
+        self.rejected_pose = 0
+
+    @property
+    def predictions_avoided(self):
+        return self.rejected_size + self.rejected_blur + self.rejected_pose
+
+    def check(self, gray, pose=None):
+        """True when a grayscale crop is worth running recognition on"""
+        reason = self._reject_reason(gray, pose)
+        with self.lock:
+            self.checked += 1
+            if reason == 'size':
+                self.rejected_size += 1
+            elif reason == 'pose':
+                self.rejected_pose += 1
+            elif reason == 'blur':
+                self.rejected_blur += 1
+        return reason is None
+
+    def _reject_reason(self, gray, pose):
+        h, w = gray.shape[:2]
+        if w < self.min_size[0] or h < self.min_size[1]:
+            return 'size'
+
+        # Pose first: it is free when the caller already has landmarks
+        if pose is not None:
+            yaw, roll = pose
+            if abs(yaw) > self.max_yaw or abs(roll) > self.max_roll:
+                return 'pose'
+
+        # Variance of the Laplacian drops sharply on blurred crops
+        if cv2.Laplacian(gray, cv2.CV_32F).var() < self.min_sharpness:
+            return 'blur'
+
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'checked': self.checked,
+                'rejected_size': self.rejected_size,
+                'rejected_blur': self.rejected_blur,
+                'rejected_pose': self.rejected_pose,
+                'predictions_avoided': self.predictions_avoided,
+            }
@@ -1,121 +1,108 @@
+import argparse
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
-from collections import deque
+from game_loop import FixedTimestep, PHYSICS_TICK_RATE
+from detector_backends import select_backend, BACKEND_CHOICES
+from frame_trace import Tracer
+from display_service import DisplayService, DISPLAY_FPS
+from head_input import HeadPredictor, LatencyExperiment, TimeConstantSmoother
+from pong_replay import SessionRecorder, new_seed
+from pong_core import PongSim, PADDLE_WIDTH, PADDLE_HEIGHT, BALL_SIZE
+from pong_render import RenderContext, SCORE_PASSES, TITLE_PASSES, status_passes
 
-# Initialize MediaPipe Face Mesh with optimized settings
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# The paddle only follows the nose tip, so any detector providing it will do
+REQUIRED_LANDMARKS = {1}
 
 # Optimized game settings
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
-PADDLE_WIDTH = 15
-PADDLE_HEIGHT = 90
-BALL_SIZE = 15
 BALL_SPEED = 6  # Slightly increased for more challenge
 PADDLE_SPEED = 5
 HEAD_CONTROL_SENSITIVITY = 1.8  # Adjusted for better control
 
+WINDOW_NAME = 'Pong Game'
+
 # Game states
 START_SCREEN = 0
 PLAYING = 1
 PAUSED = 2
 
-class PongGame:
-    def __init__(self):
-        self.ball_pos = [WINDOW_WIDTH//2, WINDOW_HEIGHT//2]
-        self.ball_vel = [BALL_SPEED, BALL_SPEED]
-        self.left_paddle = WINDOW_HEIGHT//2
-        self.right_paddle = WINDOW_HEIGHT//2
-        self.left_score = 0
-        self.right_score = 0
-        self.smooth_head_y = deque(maxlen=5)
+class PongGame(PongSim):
+    READY_FLAGS = ('player_ready',)   # Start screen state captured by session recordings
+
+    def __init__(self, tick_rate=PHYSICS_TICK_RATE, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        super().__init__(WINDOW_WIDTH, WINDOW_HEIGHT, BALL_SPEED, HEAD_CONTROL_SENSITIVITY,
+                         left_ai=True, serve_towards_scorer=True,
+                         rng=np.random.default_rng(self.seed))
+        self.recorder = None
+        self.smooth_head_y = TimeConstantSmoother()
+        self.predictor = HeadPredictor()
+        self.predict_input = True   # Extrapolate to display time instead of averaging
+        self.drawn_paddle = self.right_paddle
         self.game_state = START_SCREEN
         self.player_ready = False
-        
-    def update(self, head_y=None):
+        self.timestep = FixedTimestep(tick_rate)
+        self.render = RenderContext(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    def start(self):
+        self.game_state = PLAYING
+        self.timestep.reset()
+        self.save_previous_state()
+
+    def update(self, head_y=None, now=None, capture_time=None):
+        """Advance the game to `now` in fixed physics ticks"""
         if self.game_state == PAUSED:
             return
-            
-        # Improved AI paddle movement with prediction
-        predicted_ball_y = self.ball_pos[1] + self.ball_vel[1] * (self.ball_pos[0] / BALL_SPEED)
-        self.left_paddle += (predicted_ball_y - self.left_paddle) * 0.08
-        
-        # Smoother player paddle control
+
+        # Head input arrives at the tracking rate, independent of the tick rate
         if head_y is not None:
-            self.smooth_head_y.append(head_y)
-            avg_head_y = sum(self.smooth_head_y) / len(self.smooth_head_y)
-            target_y = avg_head_y * WINDOW_HEIGHT
-            self.right_paddle += (target_y - self.right_paddle) * HEAD_CONTROL_SENSITIVITY * 0.1
-        
-        # Smoother ball movement
-        self.ball_pos[0] += self.ball_vel[0]
-        self.ball_pos[1] += self.ball_vel[1]
-        
-        # Enhanced collision detection
-        if self.ball_pos[1] <= BALL_SIZE or self.ball_pos[1] >= WINDOW_HEIGHT - BALL_SIZE:
-            self.ball_vel[1] *= -1.02  # Slightly increase speed on bounces
-            
-        paddle_hit_sound = False
-        # Left paddle collision with improved physics
-        if (self.ball_pos[0] - BALL_SIZE <= PADDLE_WIDTH and 
-            self.left_paddle - PADDLE_HEIGHT//2 <= self.ball_pos[1] <= self.left_paddle + PADDLE_HEIGHT//2):
-            hit_pos = (self.ball_pos[1] - self.left_paddle) / (PADDLE_HEIGHT/2)
-            self.ball_vel[0] = abs(self.ball_vel[0]) * 1.05  # Speed up slightly
-            self.ball_vel[1] += hit_pos * 2  # Add angle based on hit position
-            paddle_hit_sound = True
-            
-        # Right paddle collision with improved physics
-        if (self.ball_pos[0] + BALL_SIZE >= WINDOW_WIDTH - PADDLE_WIDTH and 
-            self.right_paddle - PADDLE_HEIGHT//2 <= self.ball_pos[1] <= self.right_paddle + PADDLE_HEIGHT//2):
-            hit_pos = (self.ball_pos[1] - self.right_paddle) / (PADDLE_HEIGHT/2)
-            self.ball_vel[0] = -abs(self.ball_vel[0]) * 1.05  # Speed up slightly
-            self.ball_vel[1] += hit_pos * 2  # Add angle based on hit position
-            paddle_hit_sound = True
-            
-        # Normalize ball velocity to prevent extreme angles
-        speed = np.sqrt(self.ball_vel[0]**2 + self.ball_vel[1]**2)
-        if speed > BALL_SPEED * 2:
-            self.ball_vel = [v * (BALL_SPEED * 2 / speed) for v in self.ball_vel]
-        
-        # Score points with visual feedback
-        if self.ball_pos[0] <= 0:
-            self.right_score += 1
-            self.reset_ball(1)  # Launch towards right
-        elif self.ball_pos[0] >= WINDOW_WIDTH:
-            self.left_score += 1
-            self.reset_ball(-1)  # Launch towards left
+            if capture_time is None:
+                capture_time = time.perf_counter()
+            self.smooth_head_y.observe(head_y, capture_time)
+            self.predictor.observe(head_y, capture_time)
+        if self.predict_input:
+            head_target = self.predictor.predict()
+            if head_target is not None:
+                head_target = min(max(head_target, 0.0), 1.0)
+        else:
+            head_target = self.smooth_head_y.value
+
+        for _ in range(self.timestep.advance(now)):
+            self.save_previous_state()
+            self.step(right_target=head_target, dt=self.timestep.base_ticks)
+            if self.recorder is not None:
+                self.recorder.tick(None, head_target)
 
-    def reset_ball(self, direction=None):
-        self.ball_pos = [WINDOW_WIDTH//2, WINDOW_HEIGHT//2]
-        angle = np.random.uniform(-0.5, 0.5)  # Random angle
-        if direction is None:
-            direction = 1 if np.random.random() > 0.5 else -1
-        self.ball_vel = [
-            BALL_SPEED * direction * np.cos(angle),
-            BALL_SPEED * np.sin(angle)
-        ]
+    def handle_key(self, key):
+        """Apply a key press; returns False when the game should quit"""
+        if key == ord('q'):
+            return False
+        if key == ord(' ') and self.game_state == START_SCREEN and self.player_ready:
+            self.start()
+        return True
+
+    def draw_frame(self, frame):
+        """Whatever the current state shows"""
+        if self.game_state == START_SCREEN:
+            return self.draw_start_screen(frame)
+        return self.draw(frame)
 
     def draw(self, frame):
         # Use camera feed as background with dimming
-        game_frame = cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay = game_frame.copy()
-        cv2.addWeighted(overlay, 0.6, np.zeros_like(overlay), 0.4, 0, game_frame)
+        game_frame = self.render.dimmed_background(frame)
         
+        ball_pos, left_paddle, right_paddle = self.render_state(self.timestep.alpha)
+        self.drawn_paddle = right_paddle
+
         # Draw game elements with enhanced visuals
         # Draw paddles with glow effect
-        self.draw_paddle_with_glow(game_frame, 0, self.left_paddle, (200, 200, 200))
-        self.draw_paddle_with_glow(game_frame, WINDOW_WIDTH - PADDLE_WIDTH, self.right_paddle, (200, 200, 200))
+        self.draw_paddle_with_glow(game_frame, 0, left_paddle, (200, 200, 200))
+        self.draw_paddle_with_glow(game_frame, WINDOW_WIDTH - PADDLE_WIDTH, right_paddle, (200, 200, 200))
         
         # Draw ball with motion blur
-        self.draw_ball_with_trail(game_frame)
+        self.draw_ball_with_trail(game_frame, ball_pos)
         
         # Draw scores with background
         self.draw_score(game_frame)
@@ -132,105 +119,92 @@ class PongGame:
                          (x + thickness, int(y + PADDLE_HEIGHT//2)),
                          color, -1)
             
-    def draw_ball_with_trail(self, frame):
+    def draw_ball_with_trail(self, frame, ball_pos):
         # Draw ball trail
         alpha = 0.3
         for i in range(3):
-            pos = [int(self.ball_pos[0] - self.ball_vel[0] * i),
-                   int(self.ball_pos[1] - self.ball_vel[1] * i)]
+            pos = [int(ball_pos[0] - self.ball_vel[0] * i),
+                   int(ball_pos[1] - self.ball_vel[1] * i)]
             size = BALL_SIZE - i * 2
             cv2.circle(frame, tuple(pos), size, (255, 255, 255), -1)
 
     def draw_score(self, frame):
-        # Draw score with background
+        # Scores with shadow, re-rasterized only when they change
         score_y = 50
-        # Left score
-        cv2.putText(frame, str(self.left_score),
-                    (WINDOW_WIDTH//4, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
-        cv2.putText(frame, str(self.left_score),
-                    (WINDOW_WIDTH//4, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
-        
-        # Right score
-        cv2.putText(frame, str(self.right_score),
-                    (3*WINDOW_WIDTH//4, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
-        cv2.putText(frame, str(self.right_score),
-                    (3*WINDOW_WIDTH//4, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
+        self.render.text(frame, str(self.left_score), (WINDOW_WIDTH//4, score_y), 2, SCORE_PASSES)
+        self.render.text(frame, str(self.right_score), (3*WINDOW_WIDTH//4, score_y), 2, SCORE_PASSES)
 
     def draw_start_screen(self, frame):
-        screen = cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay = np.zeros_like(screen)
-
-        # Create gradient background
-        for i in range(WINDOW_HEIGHT):
-            alpha = i / WINDOW_HEIGHT
-            overlay[i] = [int(40 * alpha), int(100 * alpha), int(40 * alpha)]
-
-        # Blend gradient with camera feed
-        cv2.addWeighted(overlay, 0.6, screen, 0.7, 0, screen)
+        # Camera feed blended with the cached gradient
+        screen = self.render.gradient_background(frame)
 
         # Draw title with glow effect
-        title_text = "Single Player Pong"
         title_pos = (WINDOW_WIDTH//2 - 180, WINDOW_HEIGHT//2 - 50)
-        
-        # Draw glow
-        for offset in range(3):
-            cv2.putText(screen, title_text,
-                        (title_pos[0] - offset, title_pos[1]),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.5,
-                        (0, 255 - offset*30, 0), 5-offset)
-        
-        # Main text
-        cv2.putText(screen, title_text, title_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 2)
-        
-        # Draw player status with animation
+        self.render.text(screen, "Single Player Pong", title_pos, 1.5, TITLE_PASSES)
+
+        # Draw player status
         status = "Ready!" if self.player_ready else "Stand in front of camera"
         color = (0, 255, 0) if self.player_ready else (0, 165, 255)
-        
-        # Status text with glow
         status_pos = (WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50)
-        cv2.putText(screen, f"Player: {status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-        cv2.putText(screen, f"Player: {status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+        self.render.text(screen, f"Player: {status}", status_pos, 1, status_passes(color))
 
         # Draw start button when ready
         if self.player_ready:
-            btn_y = WINDOW_HEIGHT - 150
-            cv2.rectangle(screen,
-                         (WINDOW_WIDTH//2 - 100, btn_y),
-                         (WINDOW_WIDTH//2 + 100, btn_y + 60),
-                         (0, 200, 0), -1)
-            cv2.rectangle(screen,
-                         (WINDOW_WIDTH//2 - 100, btn_y),
-                         (WINDOW_WIDTH//2 + 100, btn_y + 60),
-                         (0, 255, 0), 2)
-            cv2.putText(screen, "SPACE to Start",
-                        (WINDOW_WIDTH//2 - 90, btn_y + 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            self.render.start_button(screen, WINDOW_WIDTH//2, WINDOW_HEIGHT - 150)
 
         return screen
 
 def main():
+    parser = argparse.ArgumentParser(description="Single player head-controlled pong")
+    parser.add_argument('--no-predict', action='store_true',
+                        help="use plain time-constant smoothing instead of latency-compensated input")
+    parser.add_argument('--measure-latency', action='store_true',
+                        help="alternate prediction on and off and report head-to-paddle latency for each")
+    parser.add_argument('--display-fps', type=float, default=DISPLAY_FPS,
+                        help="rate the game window is refreshed at")
+    parser.add_argument('--record', metavar='PATH', help="record the session for pong_replay.py")
+    parser.add_argument('--seed', type=int, help="seed for ball serves (random by default)")
+    parser.add_argument('--detector', choices=BACKEND_CHOICES, default='auto',
+                        help="face detector backend (default: cheapest providing the nose tip)")
+    parser.add_argument('--cascade', action='store_true',
+                        help="gate the detector with a cheaper one that only looks for faces")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="write per-frame stage timings as a Chrome trace (chrome://tracing)")
+    args = parser.parse_args()
+
+    face_detector = select_backend(REQUIRED_LANDMARKS, args.detector, args.cascade)
     cap = cv2.VideoCapture(0)
-    game = PongGame()
+    game = PongGame(seed=args.seed)
+    if args.record:
+        game.recorder = SessionRecorder(args.record, game)
+    game.predict_input = not args.no_predict
+    experiment = LatencyExperiment() if args.measure_latency else None
+
+    # HighGUI runs on its own thread; the loop below never blocks on it
+    tracer = Tracer(args.trace)
+    display = DisplayService(args.display_fps, tracer=tracer)
+    display.add_window(WINDOW_NAME)
+    display.start()
+    running = True
     
-    while True:
+    while running:
+        tracer.frame()
+        tracer.stage('capture')
         ret, frame = cap.read()
         if not ret:
             break
+        capture_time = time.perf_counter()
 
+        tracer.stage('preprocess')
         frame = cv2.flip(frame, 1)  # Mirror display
         
         # Process face mesh
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = face_mesh.process(rgb_frame)
+        tracer.stage('inference')
+        results = face_detector.process(rgb_frame)
         
         # Get head position
+        tracer.stage('postprocess')
         head_y = None
         if results.multi_face_landmarks:
             face_landmarks = results.multi_face_landmarks[0]
@@ -246,26 +220,46 @@ def main():
             game.player_ready = results.multi_face_landmarks is not None
             
             # Draw start screen
+            tracer.stage('draw')
             screen = game.draw_start_screen(frame)
-            
-            # Check for game start
-            if game.player_ready:
-                if cv2.waitKey(1) & 0xFF == ord(' '):
-                    game.game_state = PLAYING
-                    
-            cv2.imshow('Pong Game', screen)
+            tracer.stage('display')
+            display.show(WINDOW_NAME, screen, stamp=capture_time)
             
         elif game.game_state == PLAYING:
             # Update and draw game
-            game.update(head_y if results.multi_face_landmarks else None)
+            if experiment is not None:
+                game.predict_input = experiment.prediction_enabled(capture_time)
+            game.update(head_y if results.multi_face_landmarks else None, capture_time=capture_time)
+            tracer.stage('draw')
             game_frame = game.draw(frame)
-            cv2.imshow('Pong Game', game_frame)
-        
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+            tracer.stage('display')
+            display.show(WINDOW_NAME, game_frame, stamp=capture_time)
+
+            # Capture-to-display time sets how far ahead the predictor looks
+            latency = display.latency(WINDOW_NAME)
+            if latency is not None:
+                game.predictor.record_latency(latency)
+            if experiment is not None:
+                experiment.frame_drawn(capture_time, head_y, game.drawn_paddle / WINDOW_HEIGHT)
+                experiment.frame_presented(display.presented(WINDOW_NAME))
+
+        if game.recorder is not None:
+            game.recorder.frame(capture_time)
+
+        # Every key press since the last frame, none swallowed by a second waitKey
+        for key in display.keys():
+            if game.recorder is not None:
+                game.recorder.key(key)
+            running = game.handle_key(key) and running
     
     cap.release()
-    cv2.destroyAllWindows()
+    display.close()
+    tracer.close()
+    face_detector.close()
+    if game.recorder is not None:
+        game.recorder.close()
+    if experiment is not None:
+        experiment.report()
 
 if __name__ == "__main__":
     main()
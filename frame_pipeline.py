@@ -0,0 +1,68 @@
+"""Per-frame image work for forehead_detector.py, written into buffers allocated once.
+
+OpenCV writes into dst= whenever it already has the right shape and type
+and only allocates when it doesn't, so every buffer here is created on the
+first frame (or when the camera size or inference scale changes) and reused
+from then on. A frame returned by one call is overwritten by the next call
+that uses the same buffer; copy anything that has to outlive the frame.
+"""
+import cv2
+import numpy as np
+
+
+class FramePipeline:
+    def __init__(self, display_size=None):
+        self.display_size = tuple(display_size) if display_size else None   # None keeps the camera size
+        self.buffers = {}
+        self.capture = None
+        self.allocations = 0    # Buffers created; stops growing once the stream settles
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = self.buffers[name] = np.empty(shape, dtype)
+            self.allocations += 1
+        return buf
+
+    def read(self, cap):
+        """cap.read() into the same array every frame"""
+        ret, frame = cap.read(self.capture)
+        if ret:
+            self.capture = frame
+        return ret, frame
+
+    def resize(self, name, src, size, interpolation):
+        w, h = size
+        dst = self.buffer(name, (h, w) + src.shape[2:], src.dtype)
+        return cv2.resize(src, (w, h), dst=dst, interpolation=interpolation)
+
+    def scale(self, name, src, scale, interpolation=cv2.INTER_AREA):
+        if scale >= 1.0:
+            return src
+        h, w = src.shape[:2]
+        return self.resize(name, src, (max(1, round(w * scale)), max(1, round(h * scale))),
+                           interpolation)
+
+    def enhance(self, frame):
+        """Denoise, lift contrast and resize to the display size with Lanczos"""
+        # bilateralFilter can't work in place; convertScaleAbs can
+        filtered = self.buffer('filtered', frame.shape)
+        cv2.bilateralFilter(frame, 5, 75, 75, dst=filtered)
+        cv2.convertScaleAbs(filtered, dst=filtered, alpha=1.1, beta=5)
+        if self.display_size is None or self.display_size == frame.shape[1::-1]:
+            return filtered
+        return self.resize('display', filtered, self.display_size, cv2.INTER_LANCZOS4)
+
+    def rgb(self, image):
+        dst = self.buffer(('rgb', image.shape), image.shape)
+        return cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=dst)
+
+    def outline_points(self, landmarks, indices, frame_w, frame_h):
+        """Pixel (x, y) of the given landmark indices as an int32 array reused between calls"""
+        points = self.buffer(('outline', len(indices)), (len(indices), 2), np.int32)
+        landmark = landmarks.landmark
+        for row, index in enumerate(indices):
+            p = landmark[index]
+            points[row, 0] = int(p.x * frame_w)
+            points[row, 1] = int(p.y * frame_h)
+        return points
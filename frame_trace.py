@@ -0,0 +1,142 @@
+"""Per-frame stage timings written as a Chrome trace (chrome://tracing, ui.perfetto.dev).
+
+A loop calls frame() at the top of every iteration and stage(name) as it
+moves from capture to preprocess, inference, postprocess, draw and display;
+a stage lasts until the next stage() or end() on the same thread, so
+marking stages needs no re-indenting. span(name) times a block on any
+thread without touching the open stage. Spans carry the native thread ID,
+so work on the display thread or a detector pool lines up under the frame
+that caused it. With no path every call returns after a single branch.
+
+Spans are written out in batches of FLUSH_EVENTS as the loop runs, so a
+long session holds at most one batch in memory; close() writes the rest
+and ends the JSON array. A trace cut short by a crash lacks the closing
+bracket, which the trace event format allows.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+
+_NO_SPAN = contextlib.nullcontext()
+
+FLUSH_EVENTS = 4096
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'start', 'frame')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.frame = self.tracer.frames
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, threading.get_native_id(), self.start,
+                            time.perf_counter(), self.frame)
+
+
+class Tracer:
+    def __init__(self, path=None):
+        self.path = path
+        self.events = [] if path else None      # Spans not yet written
+        self.open = {}          # Native thread ID -> (stage, start, frame)
+        self.threads = {}
+        self.frames = 0
+        self.frame_start = None
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+        self.written = 0
+        self.lock = threading.Lock()
+        self.file = None
+        if path:
+            self.file = open(path, 'w')
+            self.file.write('[')
+
+    def frame(self):
+        """Close the previous frame and its last stage; spans from here on belong to the next one"""
+        if self.events is None:
+            return
+        now = time.perf_counter()
+        tid = threading.get_native_id()
+        self._close(tid, now)
+        if self.frame_start is not None:
+            self._record('frame', tid, self.frame_start, now, self.frames)
+        self.frames += 1
+        self.frame_start = now
+
+    def stage(self, name):
+        """End this thread's open stage and start the named one"""
+        if self.events is None:
+            return
+        now = time.perf_counter()
+        tid = threading.get_native_id()
+        self._close(tid, now)
+        self.open[tid] = (name, now, self.frames)
+
+    def end(self):
+        """End this thread's open stage; time until the next stage() is left unattributed"""
+        if self.events is None:
+            return
+        self._close(threading.get_native_id(), time.perf_counter())
+
+    def span(self, name):
+        """Context manager timing a block, independent of the open stage"""
+        if self.events is None:
+            return _NO_SPAN
+        return _Span(self, name)
+
+    def _close(self, tid, now):
+        opened = self.open.pop(tid, None)
+        if opened is not None:
+            name, start, frame = opened
+            self._record(name, tid, start, now, frame)
+
+    def _record(self, name, tid, start, end, frame):
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        # Spans come from several threads; the lock keeps one from landing in a batch being written
+        with self.lock:
+            if self.events is None:
+                return      # Span ended on another thread after close()
+            self.events.append((name, tid, start, end, frame))
+            if len(self.events) >= FLUSH_EVENTS:
+                self._flush()
+
+    def _write(self, trace):
+        for event in trace:
+            self.file.write(',' if self.written else '')
+            json.dump(event, self.file)
+            self.written += 1
+
+    def _flush(self):
+        self._write({
+            'name': name,
+            'cat': 'frame' if name == 'frame' else 'stage',
+            'ph': 'X',
+            'ts': (start - self.origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': tid,
+            'args': {'frame': frame},
+        } for name, tid, start, end, frame in self.events)
+        self.events.clear()
+
+    def close(self):
+        """Write the remaining spans and thread names, and end the trace file"""
+        if self.events is None:
+            return
+        self.frame()
+        with self.lock:
+            self._flush()
+            spans = self.written
+            self._write({'name': 'thread_name', 'ph': 'M', 'pid': self.pid, 'tid': tid, 'args': {'name': name}}
+                        for tid, name in self.threads.items())
+            self.file.write(']')
+            self.file.close()
+            self.events = None
+        print(f"Trace: {self.frames - 1} frames, {spans} spans written to {self.path}")
@@ -0,0 +1,216 @@
+import math
+
+import numpy as np
+
+# Never extrapolate further ahead than this, however slow the pipeline gets
+MAX_PREDICTION_HORIZON = 0.15
+# Lag of the unpredicted paddle; the 5-sample average it replaces had this at 30 fps
+SMOOTHING_TIME_CONSTANT = 0.07
+
+
+def _smoothing_factor(dt, cutoff):
+    r = 2 * math.pi * cutoff * dt
+    return r / (r + 1)
+
+
+class OneEuroFilter:
+    """One-Euro filter: heavy smoothing when still, little lag when moving fast"""
+
+    def __init__(self, min_cutoff=1.0, beta=3.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x = None
+        self.dx = 0.0
+        self.t = None
+
+    def reset(self):
+        self.x = None
+        self.dx = 0.0
+        self.t = None
+
+    def __call__(self, x, t):
+        if self.x is None or t <= self.t:
+            if self.x is None:
+                self.x = x
+            self.t = t
+            return self.x
+
+        dt = t - self.t
+        # Smoothed derivative drives the cutoff of the value filter
+        a_d = _smoothing_factor(dt, self.d_cutoff)
+        self.dx += a_d * ((x - self.x) / dt - self.dx)
+        cutoff = self.min_cutoff + self.beta * abs(self.dx)
+        self.x += _smoothing_factor(dt, cutoff) * (x - self.x)
+        self.t = t
+        return self.x
+
+
+class TimeConstantSmoother:
+    """First-order low-pass over capture time: the same response at any camera frame rate"""
+
+    def __init__(self, time_constant=SMOOTHING_TIME_CONSTANT):
+        self.time_constant = time_constant
+        self.value = None
+        self.t = None
+
+    def observe(self, x, t):
+        if self.value is None:
+            self.value = x
+        elif t <= self.t:
+            return
+        else:
+            self.value += (1.0 - math.exp(-(t - self.t) / self.time_constant)) * (x - self.value)
+        self.t = t
+
+
+class HeadPredictor:
+    """Filters head samples by capture time and extrapolates them to display time"""
+
+    def __init__(self, min_cutoff=1.0, beta=3.0, latency_smoothing=0.1,
+                 max_horizon=MAX_PREDICTION_HORIZON):
+        self.filter = OneEuroFilter(min_cutoff, beta)
+        self.latency_smoothing = latency_smoothing
+        self.max_horizon = max_horizon
+        self.latency = None   # Smoothed capture-to-display time in seconds
+
+    def observe(self, y, capture_time):
+        self.filter(y, capture_time)
+
+    def record_latency(self, seconds):
+        """Feed one measured capture-to-display time"""
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.latency_smoothing * (seconds - self.latency)
+
+    def predict(self, display_time=None):
+        """Head position expected at display_time (default: last capture + measured latency)"""
+        if self.filter.x is None:
+            return None
+        if display_time is None:
+            horizon = self.latency or 0.0
+        else:
+            horizon = display_time - self.filter.t
+        horizon = min(max(horizon, 0.0), self.max_horizon)
+        return self.filter.x + self.filter.dx * horizon
+
+
+class LatencyProbe:
+    """Motion-to-photon estimate: lag between head motion at capture and paddle motion on screen.
+
+    Records the raw head input against capture time and the paddle as drawn
+    against display time, then finds the delay that best aligns the two.
+    Samples are kept in segments so interleaved runs are never interpolated
+    across the gaps between them.
+    """
+
+    def __init__(self):
+        self.segments = []
+
+    def start_segment(self):
+        self.segments.append(([], []))
+
+    def record(self, capture_time, head_y, display_time, paddle_y):
+        if not self.segments:
+            self.start_segment()
+        inputs, outputs = self.segments[-1]
+        if head_y is not None:
+            inputs.append((capture_time, head_y))
+        outputs.append((display_time, paddle_y))
+
+    @property
+    def frames(self):
+        return sum(len(outputs) for _, outputs in self.segments)
+
+    def estimate(self, max_lag=0.5, resolution=0.005):
+        """Delay in seconds maximising the input/output correlation, or None"""
+        shifts = int(max_lag / resolution) + 1
+        dots = np.zeros(shifts)
+        a_norms = np.zeros(shifts)
+        b_norms = np.zeros(shifts)
+        for inputs, outputs in self.segments:
+            if len(inputs) < 10 or len(outputs) < 10:
+                continue
+            tin, yin = np.array(inputs).T
+            tout, yout = np.array(outputs).T
+            start, end = max(tin[0], tout[0]), min(tin[-1], tout[-1])
+            if end - start < 2 * max_lag:
+                continue
+
+            grid = np.arange(start, end, resolution)
+            a = np.interp(grid, tin, yin)
+            b = np.interp(grid, tout, yout)
+            a -= a.mean()
+            b -= b.mean()
+            for shift in range(shifts):
+                x = a[:len(a) - shift]
+                y = b[shift:]
+                dots[shift] += np.dot(x, y)
+                a_norms[shift] += np.dot(x, x)
+                b_norms[shift] += np.dot(y, y)
+
+        if not np.any(a_norms > 0) or not np.any(b_norms > 0):
+            return None
+        corr = dots / (np.sqrt(a_norms * b_norms) + 1e-12)
+        return int(np.argmax(corr)) * resolution
+
+
+class LatencyExperiment:
+    """Motion-to-photon measurement mode: alternates prediction on and off and times both.
+
+    The display presents frames asynchronously, so a drawn frame is held
+    until the display reports that same frame shown; frames it replaced
+    before showing them are never recorded.
+    """
+
+    def __init__(self, period=5.0):
+        self.period = period
+        self.probes = {True: LatencyProbe(), False: LatencyProbe()}
+        self.started = None
+        self.current = None
+        self.drawn = {}   # Capture time -> (head_y, paddle_y) of frames handed to the display
+
+    def prediction_enabled(self, now):
+        if self.started is None:
+            self.started = now
+        enabled = int((now - self.started) / self.period) % 2 == 0
+        if enabled != self.current:
+            self.current = enabled
+            self.probes[enabled].start_segment()
+        return enabled
+
+    def record(self, capture_time, head_y, display_time, paddle_y):
+        if self.current is not None:
+            self.probes[self.current].record(capture_time, head_y, display_time, paddle_y)
+
+    def frame_drawn(self, capture_time, head_y, paddle_y):
+        self.drawn[capture_time] = (head_y, paddle_y)
+
+    def frame_presented(self, presented):
+        """Record the frame DisplayService.presented() reports, paired with what it showed"""
+        if presented is None:
+            return
+        capture_time, display_time = presented
+        entry = self.drawn.pop(capture_time, None)
+        # Anything older was replaced before it reached the screen, or already recorded
+        for t in [t for t in self.drawn if t < capture_time]:
+            del self.drawn[t]
+        if entry is not None:
+            head_y, paddle_y = entry
+            self.record(capture_time, head_y, display_time, paddle_y)
+
+    def report(self):
+        """Print both latencies and the difference; returns (with, without) in ms"""
+        results = {}
+        for enabled, label in ((False, "smoothed"), (True, "predicted")):
+            lag = self.probes[enabled].estimate()
+            results[enabled] = None if lag is None else lag * 1000
+            if lag is None:
+                print(f"{label}: not enough head movement to measure latency")
+            else:
+                print(f"{label}: head-to-paddle latency {lag * 1000:.0f} ms "
+                      f"over {self.probes[enabled].frames} frames")
+        if results[True] is not None and results[False] is not None:
+            print(f"prediction saves {results[False] - results[True]:.0f} ms")
+        return results[True], results[False]
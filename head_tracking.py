@@ -0,0 +1,325 @@
+"""forehead_detector.py's capture and inference loop as a library: one result per frame.
+
+    for result in track_sync(0):                 # plain generator
+        print(result.index, [face.brain_center for face in result.faces])
+
+    async with contextlib.aclosing(track(0)) as results:    # asyncio
+        async for result in results:
+            ...
+
+Both run the blocking OpenCV/MediaPipe work on one dedicated worker
+thread (FaceMesh is stateful, so calls must stay in order on a single
+instance) and hand results over through a bounded queue. A consumer that
+falls behind stops the worker once the queue is full, so nothing piles up;
+a camera source then keeps only its newest frames in the driver. Leaving
+the loop, closing the generator or cancelling the consuming task stops
+the worker and releases the source.
+"""
+import argparse
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from detector_backends import select_backend, BACKEND_CHOICES
+from frame_pipeline import FramePipeline
+
+# Expanded face outline including more hair coverage
+FACE_OUTLINE_POINTS = [
+    10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288, 397, 365, 379, 378, 400, 377,
+    # Top of head and hair
+    10, 108, 67, 103, 54, 21, 162, 127, 234, 93, 132, 58, 172, 136, 150, 149, 176, 148, 152,
+    # Sides of head (including hair area)
+    447, 366, 401, 435, 367, 364, 394, 395, 369, 396, 175, 171, 140, 170, 169, 135, 138, 215,
+    # Extra hair volume points
+    54, 55, 56, 57, 58, 59, 60, 61, 62, 63, 64, 65, 66, 67, 68, 69, 70, 71, 72, 73, 74
+]
+
+# Key landmarks for head center calculation
+HEAD_CENTER_POINTS = {
+    'front': 168,    # Nose bridge
+    'back': 8,       # Back of head approximation
+    'left': 234,     # Left ear
+    'right': 454,    # Right ear
+    'top': 10,       # Top of head
+    'bottom': 152    # Bottom of chin
+}
+
+# Landmarks read for every face; the detector backend has to provide all of them
+TRACKED_LANDMARKS = frozenset(FACE_OUTLINE_POINTS) | frozenset(HEAD_CENTER_POINTS.values())
+
+HEAD_CIRCLE_MARGIN = 1.15   # Outline circle grown to take in hair
+QUEUE_SIZE = 4
+
+
+def calculate_brain_center(landmarks, frame_w, frame_h):
+    """Calculate approximate brain center position"""
+    left_ear = landmarks.landmark[HEAD_CENTER_POINTS['left']]
+    right_ear = landmarks.landmark[HEAD_CENTER_POINTS['right']]
+    top_head = landmarks.landmark[HEAD_CENTER_POINTS['top']]
+
+    # Calculate brain center using ears and top of head
+    center_x = (left_ear.x + right_ear.x) / 2
+    center_y = (left_ear.y + right_ear.y + top_head.y) / 3  # Weight towards top of head
+    center_z = (left_ear.z + right_ear.z) / 2
+
+    return np.array([center_x * frame_w, center_y * frame_h, center_z * frame_w])
+
+
+class FaceTracks:
+    """Stable ids for heads across frames, matched by distance to last frame's smoothed centres.
+
+    The detector's output order is not an identity: faces reorder and
+    shift down a slot when one leaves. A head that jumps further than
+    max_jump of its radius starts a new track, and a track with no match
+    for max_missed frames is dropped.
+    """
+
+    def __init__(self, max_jump=1.0, max_missed=5):
+        self.max_jump = max_jump
+        self.max_missed = max_missed
+        self.tracks = {}        # track_id -> [(x, y), radius, frames missed]
+        self.next_id = 0
+
+    def assign(self, heads):
+        """Track id for each ((x, y), radius) head of this frame, and the ids dropped"""
+        pairs = []
+        for i, ((x, y), _) in enumerate(heads):
+            for track_id, ((tx, ty), radius, _) in self.tracks.items():
+                distance = np.hypot(x - tx, y - ty)
+                if distance <= self.max_jump * radius:
+                    pairs.append((distance, i, track_id))
+
+        # Closest pairs first, each head and track used once
+        ids = [None] * len(heads)
+        matched = set()
+        for _, i, track_id in sorted(pairs):
+            if ids[i] is None and track_id not in matched:
+                ids[i] = track_id
+                matched.add(track_id)
+
+        for i, (centre, radius) in enumerate(heads):
+            if ids[i] is None:
+                ids[i] = self.next_id
+                self.next_id += 1
+            self.tracks[ids[i]] = [centre, radius, 0]
+
+        lost = []
+        for track_id, track in list(self.tracks.items()):
+            if track_id not in ids:
+                track[2] += 1
+                if track[2] > self.max_missed:
+                    del self.tracks[track_id]
+                    lost.append(track_id)
+        return ids, lost
+
+    def update(self, track_id, centre, radius):
+        """Record the smoothed head the next frame is matched against"""
+        self.tracks[track_id][:2] = centre, radius
+
+
+class Face:
+    def __init__(self, track_id, brain_center, head_center, head_radius, landmarks):
+        self.track_id = track_id            # Stable across frames while the head stays in view
+        self.brain_center = brain_center    # (x, y, z) pixels
+        self.head_center = head_center      # (x, y) pixels of the outline circle
+        self.head_radius = head_radius
+        self.landmarks = landmarks          # The backend's FaceMesh-shaped landmark list
+
+    def as_dict(self):
+        return {'track_id': self.track_id,
+                'brain_center': [round(float(v), 1) for v in self.brain_center],
+                'head_center': list(self.head_center), 'head_radius': self.head_radius}
+
+
+class TrackResult:
+    def __init__(self, index, timestamp, size, faces, frame=None):
+        self.index = index
+        self.timestamp = timestamp          # time.perf_counter() at capture
+        self.size = size                    # (width, height) the pixel coordinates refer to
+        self.faces = faces
+        self.frame = frame                  # Preprocessed BGR frame, with include_frames=True
+
+    def as_dict(self):
+        return {'index': self.index, 'timestamp': self.timestamp, 'size': list(self.size),
+                'faces': [face.as_dict() for face in self.faces]}
+
+
+class Tracker:
+    """Blocking capture, preprocessing and detection; step() returns one TrackResult or None at the end.
+
+    source is a camera index or anything cv2.VideoCapture opens, or an
+    already open capture. With display_size the frame is resized as
+    forehead_detector.py does; by default it keeps its size.
+    """
+
+    def __init__(self, source=0, detector='auto', cascade=False, max_faces=1,
+                 detection_confidence=0.5, tracking_confidence=0.5,
+                 display_size=None, scale=1.0, enhance=True, include_frames=False):
+        self.source = source
+        self.detector_options = dict(name=detector, cascade=cascade, max_faces=max_faces,
+                                     detection_confidence=detection_confidence,
+                                     tracking_confidence=tracking_confidence)
+        self.display_size = tuple(display_size) if display_size else None
+        self.scale = scale
+        self.enhance = enhance
+        self.include_frames = include_frames
+        self.cap = None
+        self.detector = None
+        self.pipeline = FramePipeline(display_size)
+        self.tracks = FaceTracks()
+        self.index = 0
+
+    def open(self):
+        self.cap = cv2.VideoCapture(self.source) if isinstance(self.source, (int, str)) else self.source
+        self.detector = select_backend(TRACKED_LANDMARKS, **self.detector_options)
+
+    def step(self):
+        if self.cap is None:
+            self.open()
+        ret, frame = self.pipeline.read(self.cap)
+        if not ret:
+            return None
+        timestamp = time.perf_counter()
+
+        if self.enhance:
+            frame = self.pipeline.enhance(frame)
+        elif self.display_size is not None:
+            frame = self.pipeline.resize('display', frame, self.display_size, cv2.INTER_AREA)
+        rgb = self.pipeline.rgb(self.pipeline.scale('inference', frame, self.scale))
+        results = self.detector.process(rgb)
+
+        frame_h, frame_w = frame.shape[:2]
+        landmark_lists = results.multi_face_landmarks or []
+        heads = []
+        for landmarks in landmark_lists:
+            points = self.pipeline.outline_points(landmarks, FACE_OUTLINE_POINTS, frame_w, frame_h)
+            (x, y), radius = cv2.minEnclosingCircle(points)
+            heads.append(((int(x), int(y)), int(radius * HEAD_CIRCLE_MARGIN)))
+        track_ids, _ = self.tracks.assign(heads)
+        faces = [Face(track_id, calculate_brain_center(landmarks, frame_w, frame_h), centre, radius, landmarks)
+                 for landmarks, track_id, (centre, radius) in zip(landmark_lists, track_ids, heads)]
+
+        result = TrackResult(self.index, timestamp, (frame_w, frame_h), faces,
+                             frame.copy() if self.include_frames else None)
+        self.index += 1
+        return result
+
+    def close(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        if self.detector is not None:
+            self.detector.close()
+            self.detector = None
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+def track_sync(source=0, queue_size=QUEUE_SIZE, **options):
+    """Generator of TrackResults; a worker thread runs ahead by at most queue_size frames"""
+    tracker = Tracker(source, **options)
+    results = queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        # Blocks while the consumer is behind, but still notices a stop
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work():
+        try:
+            while not stop.is_set():
+                result = tracker.step()
+                if not put(result) or result is None:
+                    break
+        except Exception as error:
+            put(_Failure(error))
+        finally:
+            tracker.close()
+
+    worker = threading.Thread(target=work, name="tracker", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = results.get()
+            if item is None:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+async def track(source=0, queue_size=QUEUE_SIZE, **options):
+    """Async generator of TrackResults with the same queueing as track_sync.
+
+    Close it with contextlib.aclosing (or let cancellation reach it) to stop
+    the worker promptly; a plain break leaves that to garbage collection.
+    """
+    loop = asyncio.get_running_loop()
+    tracker = Tracker(source, **options)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracker")
+    results = asyncio.Queue(queue_size)
+
+    async def produce():
+        try:
+            while True:
+                result = await loop.run_in_executor(executor, tracker.step)
+                await results.put(result)
+                if result is None:
+                    return
+        except Exception as error:
+            await results.put(_Failure(error))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            item = await results.get()
+            if item is None:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+        # Queued after any step still running, so the source is never released under it
+        await asyncio.shield(loop.run_in_executor(executor, tracker.close))
+        executor.shutdown(wait=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print one JSON line of tracked heads per frame")
+    parser.add_argument('--source', default='0', help="camera index or video path/URL")
+    parser.add_argument('--frames', type=int, help="stop after this many frames")
+    parser.add_argument('--detector', choices=BACKEND_CHOICES, default='auto')
+    parser.add_argument('--max-faces', type=int, default=1)
+    parser.add_argument('--no-enhance', action='store_true', help="skip the denoise/contrast pass")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    for result in track_sync(source, detector=args.detector, max_faces=args.max_faces,
+                             enhance=not args.no_enhance):
+        print(json.dumps(result.as_dict()), flush=True)
+        if args.frames is not None and result.index + 1 >= args.frames:
+            break
+
+
+if __name__ == "__main__":
+    main()
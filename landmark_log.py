@@ -0,0 +1,351 @@
+"""Compact landmark recording for offline analysis: chunked, memory-mapped, time indexed.
+
+A session is a directory of chunk files plus a sparse time index:
+
+    chunk-00000.lmk   64-byte header, then `capacity` rows laid out column-wise:
+                      timestamps (f8), track IDs (i4), landmarks (points x 3, f2 or u2)
+    index.bin         (time, chunk, row) for the first row of every chunk and
+                      every INDEX_EVERY rows after it
+    session.json      optional metadata, e.g. which clock the timestamps come from
+
+One row is one face in one frame. Landmarks are stored as float16, or with
+quantized=True as uint16 over QUANT_RANGE: the same size, but an even step
+of about 3e-5 where float16's steps grow to 1e-3 towards the frame edge.
+Missing points (sparse backends, meshes without the iris) are NaN, or
+QUANT_MISSING when quantized.
+
+The reader maps the chunks and hands out NumPy views straight onto the
+files, so scanning hours of sessions touches only the pages it reads.
+Timestamps must not go backwards within a session, so record from a
+monotonic clock. The open chunk's row count is published every
+FLUSH_ROWS rows or FLUSH_INTERVAL seconds, which bounds what a crash
+before close() loses.
+
+    python landmark_log.py session/                     # summary
+    python landmark_log.py session/ --start 60 --end 90 # rows in a time range
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b'LMKC'
+VERSION = 1
+CHUNK_HEADER = struct.Struct('<4sBBHII')     # magic, version, quantized, points, capacity, rows
+HEADER_SIZE = 64
+ROWS_OFFSET = 12                             # Byte offset of the row count inside the header
+
+MAX_POINTS = 478        # FaceMesh with refine_landmarks
+CHUNK_ROWS = 4096       # About 12MB of float16 landmarks per chunk
+INDEX_EVERY = 256
+FLUSH_ROWS = 256        # Publish the open chunk's row count at least this often...
+FLUSH_INTERVAL = 1.0    # ...and at least every this many seconds
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('chunk', '<u4'), ('row', '<u4')])
+
+QUANT_RANGE = (-0.5, 1.5)   # Normalised coordinates run slightly off-frame; z is small
+QUANT_MISSING = 0xFFFF
+
+
+def chunk_path(directory, number):
+    return os.path.join(directory, f"chunk-{number:05d}.lmk")
+
+
+def _layout(points, capacity):
+    # Offsets of the three columns and the size of one landmark row
+    row_bytes = points * 3 * 2
+    times = HEADER_SIZE
+    tracks = times + capacity * 8
+    landmarks = tracks + capacity * 4
+    return times, tracks, landmarks, row_bytes
+
+
+def landmark_array(face, points=MAX_POINTS):
+    """(points, 3) float32 of a FaceMesh-shaped face, NaN where it has no landmark"""
+    if hasattr(face, 'points'):
+        values = face.points
+    elif isinstance(face, np.ndarray):
+        values = face
+    else:
+        landmark = face.landmark
+        out = np.full((points, 3), np.nan, dtype=np.float32)
+        items = landmark.items() if isinstance(landmark, dict) else enumerate(landmark)
+        for index, p in items:
+            if index < points:
+                out[index] = (p.x, p.y, p.z)
+        return out
+    out = np.full((points, 3), np.nan, dtype=np.float32)
+    n = min(len(values), points)
+    out[:n] = values[:n]
+    return out
+
+
+def quantize(values):
+    low, high = QUANT_RANGE
+    scaled = np.clip((values - low) / (high - low), 0.0, 1.0) * (QUANT_MISSING - 1)
+    return np.rint(np.nan_to_num(scaled, nan=QUANT_MISSING)).astype(np.uint16)
+
+
+def dequantize(values):
+    """float32 landmarks from a quantized view, NaN where missing"""
+    low, high = QUANT_RANGE
+    out = values.astype(np.float32) * ((high - low) / (QUANT_MISSING - 1)) + low
+    out[values == QUANT_MISSING] = np.nan
+    return out
+
+
+class _Chunk:
+    """One memory-mapped chunk file with array views over its columns"""
+
+    def __init__(self, path, writable=False):
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0,
+                             access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, quantized, points, capacity, rows = CHUNK_HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} landmark chunk")
+        self.quantized = bool(quantized)
+        self.points = points
+        self.capacity = capacity
+        self.rows = rows
+        times, tracks, landmarks, row_bytes = _layout(points, capacity)
+        # A closed chunk is truncated after its last row, so size the landmark view from the file
+        stored = min(capacity, (len(self.map) - landmarks) // row_bytes)
+        self.times = np.frombuffer(self.map, '<f8', capacity, times)
+        self.tracks = np.frombuffer(self.map, '<i4', capacity, tracks)
+        dtype = '<u2' if self.quantized else '<f2'
+        self.landmarks = np.frombuffer(self.map, dtype, stored * points * 3,
+                                       landmarks).reshape(stored, points, 3)
+
+    @staticmethod
+    def create(path, points, capacity, quantized):
+        times, tracks, landmarks, row_bytes = _layout(points, capacity)
+        with open(path, 'wb') as f:
+            f.write(CHUNK_HEADER.pack(MAGIC, VERSION, quantized, points, capacity, 0))
+            f.truncate(landmarks + capacity * row_bytes)
+        return _Chunk(path, writable=True)
+
+    def set_rows(self, rows):
+        self.rows = rows
+        struct.pack_into('<I', self.map, ROWS_OFFSET, rows)
+
+    def close(self):
+        self.times = self.tracks = self.landmarks = None
+        try:
+            self.map.close()
+        except BufferError:
+            pass    # A caller still holds a view; the mapping goes with the last one
+        self.file.close()
+
+
+class LandmarkRecorder:
+    """Appends (timestamp, track ID, landmarks) rows to a session directory"""
+
+    def __init__(self, directory, points=MAX_POINTS, quantized=False,
+                 chunk_rows=CHUNK_ROWS, index_every=INDEX_EVERY,
+                 flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL, metadata=None):
+        os.makedirs(directory, exist_ok=True)
+        if glob.glob(os.path.join(directory, 'chunk-*.lmk')):
+            raise FileExistsError(f"{directory} already holds a landmark session")
+        self.directory = directory
+        self.points = points
+        self.quantized = quantized
+        self.chunk_rows = chunk_rows
+        self.index_every = index_every
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        if metadata is not None:
+            with open(os.path.join(directory, 'session.json'), 'w') as f:
+                json.dump(metadata, f, indent=2)
+        self.index = open(os.path.join(directory, 'index.bin'), 'wb')
+        self.published_row = 0
+        self.published_at = time.perf_counter()
+        self.chunk = None
+        self.chunk_number = -1
+        self.row = 0
+        self.rows = 0
+        self.last_time = -np.inf
+
+    def add(self, timestamp, track_id, face):
+        """Record one face: a FaceMesh-shaped landmark list or an (N, 3) array"""
+        if timestamp < self.last_time:
+            raise ValueError("landmark timestamps must not go backwards")
+        self.last_time = timestamp
+        if self.chunk is None or self.row == self.chunk_rows:
+            self._next_chunk()
+        if self.row % self.index_every == 0:
+            self.index.write(np.array((timestamp, self.chunk_number, self.row),
+                                      dtype=INDEX_DTYPE).tobytes())
+
+        values = landmark_array(face, self.points)
+        self.chunk.times[self.row] = timestamp
+        self.chunk.tracks[self.row] = track_id
+        self.chunk.landmarks[self.row] = quantize(values) if self.quantized else values
+        self.row += 1
+        self.rows += 1
+        if (self.row - self.published_row >= self.flush_rows
+                or time.perf_counter() - self.published_at >= self.flush_interval):
+            self._publish()
+
+    def _next_chunk(self):
+        self._close_chunk()
+        self.chunk_number += 1
+        self.chunk = _Chunk.create(chunk_path(self.directory, self.chunk_number),
+                                   self.points, self.chunk_rows, self.quantized)
+        self.row = 0
+
+    def _publish(self):
+        # Row count and index reach the files; the rows themselves are already in the shared mapping
+        if self.chunk is not None:
+            self.chunk.set_rows(self.row)
+        self.index.flush()
+        self.published_row = self.row
+        self.published_at = time.perf_counter()
+
+    def flush(self):
+        """Make rows so far visible to a reader opened afterwards, and write them to disk"""
+        self._publish()
+        if self.chunk is not None:
+            self.chunk.map.flush()
+
+    def _close_chunk(self):
+        if self.chunk is None:
+            return
+        self.chunk.set_rows(self.row)
+        path = self.chunk.file.name
+        times, tracks, landmarks, row_bytes = _layout(self.points, self.chunk_rows)
+        self.chunk.close()
+        self.chunk = None
+        self.published_row = 0
+        # Drop the unused tail of the landmark column
+        with open(path, 'r+b') as f:
+            f.truncate(landmarks + self.row * row_bytes)
+
+    def close(self):
+        """Finish the open chunk; safe to call more than once"""
+        self._close_chunk()
+        if not self.index.closed:
+            self.index.close()
+
+
+class LandmarkLog:
+    """Read side of a session: time-range queries as views onto the mapped chunks"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.paths = sorted(glob.glob(os.path.join(directory, 'chunk-*.lmk')))
+        self.chunks = {}
+        index_path = os.path.join(directory, 'index.bin')
+        size = os.path.getsize(index_path) // INDEX_DTYPE.itemsize if os.path.exists(index_path) else 0
+        self.index = np.fromfile(index_path, INDEX_DTYPE, size) if size else np.empty(0, INDEX_DTYPE)
+        metadata_path = os.path.join(directory, 'session.json')
+        self.metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                self.metadata = json.load(f)
+
+    def _chunk(self, number):
+        if number not in self.chunks:
+            self.chunks[number] = _Chunk(self.paths[number])
+        return self.chunks[number]
+
+    def __len__(self):
+        return sum(self._chunk(n).rows for n in range(len(self.paths)))
+
+    @property
+    def quantized(self):
+        return bool(self.paths) and self._chunk(0).quantized
+
+    def range(self, start=-np.inf, end=np.inf):
+        """Yield (times, track_ids, landmarks) views for rows with start <= time < end, one per chunk"""
+        if not len(self.index):
+            return
+        # Last index entry before start, so rows sharing start's timestamp aren't skipped;
+        # every chunk's first row is indexed
+        entry = self.index[max(int(np.searchsorted(self.index['time'], start, 'left')) - 1, 0)]
+        number, row = int(entry['chunk']), int(entry['row'])
+        while number < len(self.paths):
+            chunk = self._chunk(number)
+            times = chunk.times[:chunk.rows]
+            if row >= len(times) or times[row] >= end:
+                if row < len(times):
+                    return
+                number, row = number + 1, 0
+                continue
+            lo = row + int(np.searchsorted(times[row:], start, 'left'))
+            hi = lo + int(np.searchsorted(times[lo:], end, 'left'))
+            if hi > lo:
+                yield chunk.times[lo:hi], chunk.tracks[lo:hi], chunk.landmarks[lo:hi]
+            if hi < len(times):
+                return
+            number, row = number + 1, 0
+
+    def read(self, start=-np.inf, end=np.inf):
+        """One (times, track_ids, float32 landmarks) copy of a time range"""
+        parts = list(self.range(start, end))
+        if not parts:
+            points = self._chunk(0).points if self.paths else MAX_POINTS
+            return np.empty(0), np.empty(0, np.int32), np.empty((0, points, 3), np.float32)
+        times = np.concatenate([p[0] for p in parts])
+        tracks = np.concatenate([p[1] for p in parts])
+        convert = dequantize if self.quantized else (lambda v: v.astype(np.float32))
+        landmarks = np.concatenate([convert(p[2]) for p in parts])
+        return times, tracks, landmarks
+
+    def summary(self):
+        rows = 0
+        first = last = None
+        tracks = set()
+        for number in range(len(self.paths)):
+            chunk = self._chunk(number)
+            if chunk.rows:
+                first = chunk.times[0] if first is None else first
+                last = chunk.times[chunk.rows - 1]
+                tracks.update(np.unique(chunk.tracks[:chunk.rows]).tolist())
+            rows += chunk.rows
+        size = sum(os.path.getsize(p) for p in self.paths)
+        return {
+            'rows': rows,
+            'chunks': len(self.paths),
+            'seconds': float(last - first) if rows else 0.0,
+            'tracks': sorted(tracks),
+            'quantized': self.quantized,
+            'bytes': size,
+            'bytes_per_face': size / rows if rows else 0.0,
+            'metadata': self.metadata,
+        }
+
+    def close(self):
+        for chunk in self.chunks.values():
+            chunk.close()
+        self.chunks.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise or query a recorded landmark session")
+    parser.add_argument('session')
+    parser.add_argument('--start', type=float, help="range start, in recorded timestamp units")
+    parser.add_argument('--end', type=float, help="range end (exclusive)")
+    args = parser.parse_args()
+
+    log = LandmarkLog(args.session)
+    try:
+        if args.start is None and args.end is None:
+            print(json.dumps(log.summary(), indent=2))
+            return
+        start = -np.inf if args.start is None else args.start
+        end = np.inf if args.end is None else args.end
+        rows = 0
+        for times, tracks, landmarks in log.range(start, end):
+            rows += len(times)
+        print(json.dumps({'start': args.start, 'end': args.end, 'rows': rows}, indent=2))
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,35 @@
+import argparse
 import cv2
-import mediapipe as mp
+from detector_backends import select_backend
+from frame_trace import Tracer
 
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=1,
-    refine_landmarks=False,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+KEY_POINTS = [10, 234, 454, 152]  # top, left, right, bottom
+
+parser = argparse.ArgumentParser(description="Minimal head circle")
+parser.add_argument('--trace', metavar='PATH',
+                    help="write per-frame stage timings as a Chrome trace (chrome://tracing)")
+tracer = Tracer(parser.parse_args().trace)
+
+# Only four points are needed, so the cheapest detector providing them is used
+face_mesh = select_backend(KEY_POINTS)
 cap = cv2.VideoCapture(0)
 while True:
+    tracer.frame()
+    tracer.stage('capture')
     ret, frame = cap.read()
     if not ret:
         break
+    tracer.stage('preprocess')
     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    tracer.stage('inference')
     results = face_mesh.process(rgb_frame)
+    tracer.stage('postprocess')
     
     if results.multi_face_landmarks:
         for face_landmarks in results.multi_face_landmarks:
             h, w = frame.shape[:2]
             face_points = []
-            key_points = [10, 234, 454, 152]  # top, left, right, bottom
-            for idx in key_points:
+            for idx in KEY_POINTS:
                 point = face_landmarks.landmark[idx]
                 x = int(point.x * w)
                 y = int(point.y * h)
@@ -34,8 +42,10 @@ while True:
                 center_y = int((max(y_coords) + min(y_coords)) / 2)
                 radius = int((max(x_coords) - min(x_coords)) / 2)
 
+                tracer.stage('draw')
                 cv2.circle(frame, (center_x, center_y), radius, (0, 255, 0), 2)
     
+    tracer.stage('display')
     cv2.imshow('Minimal', frame)
     
     if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -44,4 +54,5 @@ while True:
 # Cleanup
 cap.release()
 cv2.destroyAllWindows()
+tracer.close()
 face_mesh.close()
\ No newline at end of file
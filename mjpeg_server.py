@@ -0,0 +1,193 @@
+"""Watch annotated frames from another machine: MJPEG over HTTP with one encode per frame.
+
+    /               a page showing the stream
+    /stream.mjpg    multipart MJPEG, for browsers and VLC
+    /snapshot.jpg   the next encoded frame as a single JPEG
+
+publish() only copies the frame into a hand-over buffer, and only when
+someone is watching; an encoder thread turns the newest one into a JPEG
+at most `fps` times a second. Every client sends that same JPEG, so the
+cost is one encode per frame however many are connected. A client that
+can't keep up sends the newest JPEG when its socket frees up and skips
+the ones in between, so nothing backs up behind it.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+STREAM_PORT = 8080
+STREAM_FPS = 15
+JPEG_QUALITY = 80
+BOUNDARY = 'frame'
+SNAPSHOT_TIMEOUT = 2.0
+
+PAGE = (b"<!doctype html><title>Forehead Detector</title>"
+        b"<body style='margin:0;background:#000'>"
+        b"<img src='/stream.mjpg' style='width:100%;height:auto'></body>")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        streamer = self.server.streamer
+        path = self.path.split('?')[0]
+        if path == '/':
+            self._send(200, 'text/html', PAGE)
+        elif path == '/snapshot.jpg':
+            jpeg = streamer.snapshot()
+            if jpeg is None:
+                self._send(503, 'text/plain', b"no frame yet\n")
+            else:
+                self._send(200, 'image/jpeg', jpeg)
+        elif path == '/stream.mjpg':
+            self._stream(streamer)
+        else:
+            self._send(404, 'text/plain', b"not found\n")
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, streamer):
+        self.send_response(200)
+        self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        streamer.add_client()
+        sequence = None
+        try:
+            while not streamer.stopping:
+                latest, jpeg = streamer.next_jpeg(sequence)
+                if jpeg is None:
+                    continue
+                if sequence is not None:
+                    streamer.count_skipped(latest - sequence - 1)
+                sequence = latest
+                self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                 f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            streamer.remove_client()
+
+    def log_message(self, format, *args):
+        pass    # One line per request would flood the console with stream reconnects
+
+
+class MJPEGServer:
+    def __init__(self, host='0.0.0.0', port=STREAM_PORT, fps=STREAM_FPS, quality=JPEG_QUALITY):
+        self.interval = 1.0 / fps
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.condition = threading.Condition()
+        self.pending = None         # Newest published frame, waiting for the encoder
+        self.working = None         # Buffer the encoder reads; swapped with pending
+        self.dirty = False
+        self.jpeg = None
+        self.sequence = 0
+        self.clients = 0
+        self.snapshot_waiters = 0
+        self.last_publish = -np.inf
+        self.stopping = False
+        self.encoded = 0
+        self.skipped = 0            # Frames encoded but passed over by a slow client
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.streamer = self
+        self.threads = []
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        for target, name in ((self.httpd.serve_forever, "mjpeg-http"), (self._encode, "mjpeg-encoder")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def publish(self, frame):
+        """Offer a frame; copied only if someone is watching and the rate allows, else ignored"""
+        if not (self.clients or self.snapshot_waiters):
+            return False
+        now = time.perf_counter()
+        if now - self.last_publish < self.interval:
+            return False
+        self.last_publish = now
+        with self.condition:
+            if self.pending is None or self.pending.shape != frame.shape:
+                self.pending = np.empty_like(frame)
+            np.copyto(self.pending, frame)
+            self.dirty = True
+            self.condition.notify_all()
+        return True
+
+    def _encode(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.dirty or self.stopping)
+                if self.stopping:
+                    return
+                self.pending, self.working = self.working, self.pending
+                self.dirty = False
+            ok, data = cv2.imencode('.jpg', self.working, self.params)
+            if not ok:
+                continue
+            with self.condition:
+                self.jpeg = data.tobytes()
+                self.sequence += 1
+                self.encoded += 1
+                self.condition.notify_all()
+
+    def next_jpeg(self, after, timeout=1.0):
+        """(sequence, JPEG bytes) newer than `after`, or (after, None) on timeout"""
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.stopping or (self.jpeg is not None and self.sequence != after), timeout)
+            if self.jpeg is None or self.sequence == after:
+                return after, None
+            return self.sequence, self.jpeg
+
+    def snapshot(self):
+        # Wait for a fresh encode; with no stream running the last JPEG could be minutes old
+        with self.condition:
+            self.snapshot_waiters += 1
+            after = self.sequence
+        try:
+            return self.next_jpeg(after, SNAPSHOT_TIMEOUT)[1]
+        finally:
+            with self.condition:
+                self.snapshot_waiters -= 1
+
+    def add_client(self):
+        with self.condition:
+            self.clients += 1
+
+    def remove_client(self):
+        with self.condition:
+            self.clients -= 1
+
+    def count_skipped(self, frames):
+        with self.condition:
+            self.skipped += frames
+
+    def stats(self):
+        return {'encoded': self.encoded, 'skipped_by_clients': self.skipped, 'clients': self.clients}
+
+    def close(self):
+        with self.condition:
+            self.stopping = True
+            self.condition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for thread in self.threads:
+            thread.join()
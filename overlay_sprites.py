@@ -0,0 +1,144 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+BLACK = (0, 0, 0)
+
+
+class Sprite:
+    """Pre-rasterized overlay element: BGR pixels plus an alpha mask"""
+
+    def __init__(self, image, alpha, anchor):
+        # Trim to the inked box so blits touch as few pixels as possible
+        ys, xs = np.nonzero(alpha)
+        if len(ys):
+            y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        else:
+            y0 = y1 = x0 = x1 = 0
+        image = image[y0:y1, x0:x1]
+        alpha = alpha[y0:y1, x0:x1]
+        self.anchor = (anchor[0] - x0, anchor[1] - y0)   # Sprite pixel that lands on the blit position
+
+        self.opaque = bool(np.all(alpha == 255))
+        self.binary = bool(np.all((alpha == 0) | (alpha == 255)))
+        self.mask = alpha[..., None] > 0
+        self.weights = alpha.astype(np.float32) / 255.0
+        self.inv_weights = 1.0 - self.weights
+
+        # image was drawn over black, i.e. premultiplied; blendLinear wants straight colour
+        if self.binary:
+            self.image = np.ascontiguousarray(image)
+        else:
+            straight = image.astype(np.float32) * 255.0 / np.maximum(alpha, 1)[..., None]
+            self.image = np.clip(straight + 0.5, 0, 255).astype(np.uint8)
+
+    @property
+    def size(self):
+        return self.image.shape[1], self.image.shape[0]
+
+    def blit(self, dst, pos):
+        """Composite onto dst with the anchor at pos, touching only the sprite's box"""
+        h, w = self.image.shape[:2]
+        x0 = int(pos[0]) - self.anchor[0]
+        y0 = int(pos[1]) - self.anchor[1]
+
+        # Clip against the destination
+        sx0, sy0 = max(0, -x0), max(0, -y0)
+        sx1 = min(w, dst.shape[1] - x0)
+        sy1 = min(h, dst.shape[0] - y0)
+        if sx0 >= sx1 or sy0 >= sy1:
+            return
+        roi = dst[y0 + sy0:y0 + sy1, x0 + sx0:x0 + sx1]
+        image = self.image[sy0:sy1, sx0:sx1]
+
+        if self.opaque:
+            roi[:] = image
+        elif self.binary:
+            np.copyto(roi, image, where=self.mask[sy0:sy1, sx0:sx1])
+        else:
+            roi[:] = cv2.blendLinear(image, roi, self.weights[sy0:sy1, sx0:sx1],
+                                     self.inv_weights[sy0:sy1, sx0:sx1])
+
+
+def rasterize(size, anchor, draw):
+    """Build a Sprite by running draw(canvas, ink) once for colour and once for coverage.
+
+    Colour is drawn over black, so anti-aliased edges come out premultiplied.
+    """
+    w, h = size
+    image = np.zeros((h, w, 3), dtype=np.uint8)
+    alpha = np.zeros((h, w), dtype=np.uint8)
+    draw(image, lambda color: color)
+    draw(alpha, lambda color: 255)
+    return Sprite(image, alpha, anchor)
+
+
+def text_sprite(text, scale, passes, font=FONT, background=None, pad=0):
+    """Sprite for text drawn in several passes (shadow, glow, main stroke).
+
+    passes are (dx, dy, color, thickness, line_type) applied in order; the
+    sprite anchor is the putText origin, and background fills a box pad
+    pixels around the text like draw_text_with_background does.
+    """
+    max_thickness = max(p[3] for p in passes)
+    (text_w, text_h), baseline = cv2.getTextSize(text, font, scale, max_thickness)
+    margin = max(max_thickness, pad) + max(max(abs(p[0]), abs(p[1])) for p in passes) + 2
+    anchor = (margin, text_h + margin)
+    size = (text_w + 2 * margin, text_h + baseline + 2 * margin)
+
+    def draw(canvas, ink):
+        if background is not None:
+            cv2.rectangle(canvas, (anchor[0] - pad, anchor[1] - text_h - pad),
+                          (anchor[0] + text_w + pad, anchor[1] + pad), ink(background), -1)
+        for dx, dy, color, thickness, line_type in passes:
+            cv2.putText(canvas, text, (anchor[0] + dx, anchor[1] + dy), font, scale,
+                        ink(color), thickness, line_type)
+
+    return rasterize(size, anchor, draw)
+
+
+def shadowed_text_passes(color, thickness, shadow_thickness):
+    return [(0, 0, BLACK, shadow_thickness, cv2.LINE_8),
+            (0, 0, color, thickness, cv2.LINE_8)]
+
+
+def crosshair_sprite(size, color, thickness, glow_intensity):
+    """The detector's glowing crosshair, anchored on its centre"""
+    margin = size + thickness + glow_intensity + 2
+    anchor = (margin, margin)
+
+    def draw(canvas, ink):
+        for offset in range(glow_intensity):
+            cv2.line(canvas, (margin - size, margin), (margin + size, margin),
+                     ink(color), thickness + offset, cv2.LINE_AA)
+            cv2.line(canvas, (margin, margin - size), (margin, margin + size),
+                     ink(color), thickness + offset, cv2.LINE_AA)
+
+    return rasterize((2 * margin + 1, 2 * margin + 1), anchor, draw)
+
+
+class SpriteCache:
+    """LRU of sprites keyed by whatever determines their pixels (text, style...)"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.sprites = OrderedDict()
+        self.builds = 0
+
+    def get(self, key, build):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = build()
+            self.builds += 1
+            self.sprites[key] = sprite
+            if len(self.sprites) > self.max_size:
+                self.sprites.popitem(last=False)
+        else:
+            self.sprites.move_to_end(key)
+        return sprite
+
+    def text(self, text, scale, passes, font=FONT, background=None, pad=0):
+        key = (text, scale, tuple(passes), font, background, pad)
+        return self.get(key, lambda: text_sprite(text, scale, passes, font, background, pad))
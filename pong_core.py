@@ -0,0 +1,294 @@
+import numpy as np
+from game_loop import lerp
+
+# Shared pong physics tuning, per physics tick
+PADDLE_WIDTH = 15
+PADDLE_HEIGHT = 90
+BALL_SIZE = 15
+AI_TRACKING = 0.08      # Fraction of the gap the AI paddle closes each tick
+WALL_BOUNCE = 1.02      # Slight speed-up on wall bounces
+PADDLE_SPEEDUP = 1.05   # Speed-up on paddle hits
+PADDLE_SPIN = 2         # Vertical speed added per unit of off-centre hit
+MAX_SPEED_FACTOR = 2    # Ball speed is capped at ball_speed * this
+MAX_IMPACTS_PER_STEP = 8
+
+
+def _ease(rate, dt):
+    # A per-tick easing rate applied over dt ticks
+    return rate if dt == 1 else 1 - (1 - rate) ** dt
+
+
+class PongSim:
+    """Render-free pong simulation shared by the single and two player games"""
+
+    def __init__(self, width, height, ball_speed, sensitivity, left_ai=False,
+                 serve_towards_scorer=True, rng=None):
+        self.width = width
+        self.height = height
+        self.ball_speed = ball_speed
+        self.sensitivity = sensitivity
+        self.left_ai = left_ai
+        self.serve_towards_scorer = serve_towards_scorer
+        self.rng = np.random if rng is None else rng
+        self.ball_pos = [width//2, height//2]
+        self.ball_vel = [ball_speed, ball_speed]
+        self.left_paddle = height//2
+        self.right_paddle = height//2
+        self.left_score = 0
+        self.right_score = 0
+        self.paddle_hit = False
+        self.save_previous_state()
+
+    def save_previous_state(self):
+        self.prev_ball_pos = list(self.ball_pos)
+        self.prev_left_paddle = self.left_paddle
+        self.prev_right_paddle = self.right_paddle
+
+    def snapshot(self):
+        """Everything step() depends on, for rollback; needs a numpy Generator as rng"""
+        return (tuple(self.ball_pos), tuple(self.ball_vel), self.left_paddle, self.right_paddle,
+                self.left_score, self.right_score, self.paddle_hit, self.rng.bit_generator.state)
+
+    def restore(self, state):
+        (ball_pos, ball_vel, self.left_paddle, self.right_paddle,
+         self.left_score, self.right_score, self.paddle_hit, rng_state) = state
+        self.ball_pos = list(ball_pos)
+        self.ball_vel = list(ball_vel)
+        self.rng.bit_generator.state = rng_state
+
+    def render_state(self, alpha):
+        """Ball and paddle positions interpolated between the last two ticks"""
+        ball = (lerp(self.prev_ball_pos[0], self.ball_pos[0], alpha),
+                lerp(self.prev_ball_pos[1], self.ball_pos[1], alpha))
+        return (ball,
+                lerp(self.prev_left_paddle, self.left_paddle, alpha),
+                lerp(self.prev_right_paddle, self.right_paddle, alpha))
+
+    def step(self, left_target=None, right_target=None, dt=1):
+        """Advance dt ticks (may be fractional or >1); targets are normalised paddle heights (0-1) or None"""
+        if self.left_ai:
+            # AI paddle tracks where the ball will be when it arrives
+            predicted_ball_y = self.ball_pos[1] + self.ball_vel[1] * (self.ball_pos[0] / self.ball_speed)
+            self.left_paddle += (predicted_ball_y - self.left_paddle) * _ease(AI_TRACKING, dt)
+        elif left_target is not None:
+            self.left_paddle += (left_target * self.height - self.left_paddle) * _ease(self.sensitivity * 0.1, dt)
+
+        if right_target is not None:
+            self.right_paddle += (right_target * self.height - self.right_paddle) * _ease(self.sensitivity * 0.1, dt)
+
+        self.paddle_hit = False
+        self.move_ball(dt)
+
+        # Normalize ball velocity to prevent extreme angles
+        self.clamp_speed()
+
+        if self.ball_pos[0] <= 0:
+            self.right_score += 1
+            self.reset_ball(1 if self.serve_towards_scorer else -1)
+        elif self.ball_pos[0] >= self.width:
+            self.left_score += 1
+            self.reset_ball(-1 if self.serve_towards_scorer else 1)
+
+    def clamp_speed(self):
+        max_speed = self.ball_speed * MAX_SPEED_FACTOR
+        speed = np.sqrt(self.ball_vel[0]**2 + self.ball_vel[1]**2)
+        if speed > max_speed:
+            self.ball_vel = [v * (max_speed / speed) for v in self.ball_vel]
+
+    def move_ball(self, dt):
+        """Sweep the ball through dt ticks, reflecting at the exact time of each impact.
+
+        Walls and paddle faces are treated as planes the ball centre crosses
+        (offset by BALL_SIZE), so fast balls and long steps can't tunnel.
+        """
+        top, bottom = BALL_SIZE, self.height - BALL_SIZE
+        left_face = PADDLE_WIDTH + BALL_SIZE
+        right_face = self.width - PADDLE_WIDTH - BALL_SIZE
+        half = PADDLE_HEIGHT//2
+
+        # A ball already behind a paddle can only go on to score
+        passed_left = self.ball_pos[0] < left_face
+        passed_right = self.ball_pos[0] > right_face
+        remaining = dt
+
+        for _ in range(MAX_IMPACTS_PER_STEP):
+            x, y = self.ball_pos
+            vx, vy = self.ball_vel
+
+            t_wall = np.inf
+            if vy < 0:
+                t_wall = max((top - y) / vy, 0.0)
+            elif vy > 0:
+                t_wall = max((bottom - y) / vy, 0.0)
+
+            t_paddle = np.inf
+            if vx < 0 and not passed_left:
+                t_paddle = max((left_face - x) / vx, 0.0)
+            elif vx > 0 and not passed_right:
+                t_paddle = max((right_face - x) / vx, 0.0)
+
+            t = min(t_wall, t_paddle)
+            if t > remaining:
+                break
+
+            self.ball_pos = [x + vx * t, y + vy * t]
+            remaining -= t
+
+            if t_wall <= t_paddle:
+                self.ball_vel[1] *= -WALL_BOUNCE  # Slightly increase speed on bounces
+                continue
+
+            # Paddle face reached: bounce if the paddle covers the impact point
+            paddle = self.left_paddle if vx < 0 else self.right_paddle
+            impact_y = self.ball_pos[1]
+            if paddle - half <= impact_y <= paddle + half:
+                hit_pos = (impact_y - paddle) / (PADDLE_HEIGHT/2)
+                self.ball_vel[0] = abs(vx) * PADDLE_SPEEDUP if vx < 0 else -abs(vx) * PADDLE_SPEEDUP
+                self.ball_vel[1] += hit_pos * PADDLE_SPIN
+                self.clamp_speed()
+                self.paddle_hit = True
+            elif vx < 0:
+                passed_left = True
+            else:
+                passed_right = True
+
+        self.ball_pos = [self.ball_pos[0] + self.ball_vel[0] * remaining,
+                         self.ball_pos[1] + self.ball_vel[1] * remaining]
+
+    def reset_ball(self, direction=None):
+        self.ball_pos = [self.width//2, self.height//2]
+        angle = self.rng.uniform(-0.5, 0.5)  # Random angle
+        if direction is None:
+            direction = 1 if self.rng.random() > 0.5 else -1
+        self.ball_vel = [
+            self.ball_speed * direction * np.cos(angle),
+            self.ball_speed * np.sin(angle)
+        ]
+        # Don't interpolate across the jump back to the centre
+        self.prev_ball_pos = list(self.ball_pos)
+
+
+class PongBatch:
+    """Many independent PongSim games stepped at once with NumPy arrays.
+
+    Used offline for tuning the AI, sensitivity and speed constants; each
+    row follows the same rules as PongSim.step.
+    """
+
+    def __init__(self, n_games, width, height, ball_speed, sensitivity, left_ai=False,
+                 serve_towards_scorer=True, seed=None):
+        self.n_games = n_games
+        self.width = width
+        self.height = height
+        self.ball_speed = ball_speed
+        self.sensitivity = sensitivity
+        self.left_ai = left_ai
+        self.serve_towards_scorer = serve_towards_scorer
+        self.rng = np.random.default_rng(seed)
+        self.ball_pos = np.empty((n_games, 2))
+        self.ball_pos[:] = (width//2, height//2)
+        self.ball_vel = np.full((n_games, 2), float(ball_speed))
+        self.left_paddle = np.full(n_games, float(height//2))
+        self.right_paddle = np.full(n_games, float(height//2))
+        self.left_score = np.zeros(n_games, dtype=np.int64)
+        self.right_score = np.zeros(n_games, dtype=np.int64)
+        self.paddle_hits = np.zeros(n_games, dtype=np.int64)
+        self.steps = 0
+
+    def step(self, left_target=None, right_target=None, dt=1):
+        """Advance every game dt ticks; targets are scalars or per-game arrays"""
+        x, y = self.ball_pos[:, 0], self.ball_pos[:, 1]
+        vy = self.ball_vel[:, 1]
+
+        if self.left_ai:
+            predicted_ball_y = y + vy * (x / self.ball_speed)
+            self.left_paddle += (predicted_ball_y - self.left_paddle) * _ease(AI_TRACKING, dt)
+        elif left_target is not None:
+            self.left_paddle += ((np.asarray(left_target) * self.height - self.left_paddle) *
+                                 _ease(self.sensitivity * 0.1, dt))
+
+        if right_target is not None:
+            self.right_paddle += ((np.asarray(right_target) * self.height - self.right_paddle) *
+                                  _ease(self.sensitivity * 0.1, dt))
+
+        self.move_balls(dt)
+        self.clamp_speed(np.ones(self.n_games, dtype=bool))
+
+        right_scored = x <= 0
+        left_scored = ~right_scored & (x >= self.width)
+        self.right_score += right_scored
+        self.left_score += left_scored
+        if right_scored.any() or left_scored.any():
+            toward_scorer = 1 if self.serve_towards_scorer else -1
+            self.reset_balls(right_scored, toward_scorer)
+            self.reset_balls(left_scored, -toward_scorer)
+        self.steps += 1
+
+    def clamp_speed(self, mask):
+        max_speed = self.ball_speed * MAX_SPEED_FACTOR
+        speed = np.hypot(self.ball_vel[:, 0], self.ball_vel[:, 1])
+        too_fast = mask & (speed > max_speed)
+        self.ball_vel[too_fast] *= (max_speed / speed[too_fast])[:, None]
+
+    def move_balls(self, dt):
+        """Vectorised PongSim.move_ball: every game resolves its next impact per pass"""
+        x, y = self.ball_pos[:, 0], self.ball_pos[:, 1]
+        vx, vy = self.ball_vel[:, 0], self.ball_vel[:, 1]
+        top, bottom = BALL_SIZE, self.height - BALL_SIZE
+        left_face = PADDLE_WIDTH + BALL_SIZE
+        right_face = self.width - PADDLE_WIDTH - BALL_SIZE
+        half = PADDLE_HEIGHT//2
+
+        passed_left = x < left_face
+        passed_right = x > right_face
+        remaining = np.full(self.n_games, float(dt))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for _ in range(MAX_IMPACTS_PER_STEP):
+                t_wall = np.where(vy < 0, (top - y) / vy,
+                                  np.where(vy > 0, (bottom - y) / vy, np.inf))
+                t_paddle = np.where((vx < 0) & ~passed_left, (left_face - x) / vx,
+                                    np.where((vx > 0) & ~passed_right, (right_face - x) / vx, np.inf))
+                np.maximum(t_wall, 0.0, out=t_wall)
+                np.maximum(t_paddle, 0.0, out=t_paddle)
+
+                t = np.minimum(t_wall, t_paddle)
+                active = t <= remaining
+                if not active.any():
+                    break
+
+                t[~active] = 0.0
+                x += vx * t
+                y += vy * t
+                remaining -= t
+
+                wall = active & (t_wall <= t_paddle)
+                vy[wall] *= -WALL_BOUNCE
+
+                face = active & ~wall
+                at_left = face & (vx < 0)
+                at_right = face & (vx > 0)
+                hit_left = at_left & (self.left_paddle - half <= y) & (y <= self.left_paddle + half)
+                hit_right = at_right & (self.right_paddle - half <= y) & (y <= self.right_paddle + half)
+
+                vx[hit_left] = np.abs(vx[hit_left]) * PADDLE_SPEEDUP
+                vy[hit_left] += (y[hit_left] - self.left_paddle[hit_left]) / (PADDLE_HEIGHT/2) * PADDLE_SPIN
+                vx[hit_right] = -np.abs(vx[hit_right]) * PADDLE_SPEEDUP
+                vy[hit_right] += (y[hit_right] - self.right_paddle[hit_right]) / (PADDLE_HEIGHT/2) * PADDLE_SPIN
+                self.clamp_speed(hit_left | hit_right)
+                self.paddle_hits += hit_left | hit_right
+
+                passed_left |= at_left & ~hit_left
+                passed_right |= at_right & ~hit_right
+
+        x += vx * remaining
+        y += vy * remaining
+
+    def reset_balls(self, mask, direction):
+        count = int(mask.sum())
+        if not count:
+            return
+        angle = self.rng.uniform(-0.5, 0.5, count)
+        self.ball_pos[mask] = (self.width//2, self.height//2)
+        self.ball_vel[mask, 0] = self.ball_speed * direction * np.cos(angle)
+        self.ball_vel[mask, 1] = self.ball_speed * np.sin(angle)
@@ -0,0 +1,447 @@
+"""Networked two player pong over UDP with input delay and rollback.
+
+Each player runs their own camera and single-face tracker. Both machines
+run the same deterministic simulation from a shared seed and exchange
+only paddle inputs: a player's input for tick t is applied at tick
+t + input delay. When the other player's input for a tick hasn't arrived
+yet, their last known input is assumed; if the real one turns out
+different, the game rolls back to that tick and re-simulates.
+
+    python pong_net.py --host 5005                      # left paddle
+    python pong_net.py --join 192.168.1.20:5005          # right paddle
+
+    # Both on one machine, through a bad link
+    python pong_net.py --host 5005 --latency 60 --jitter 20 --loss 0.05
+    python pong_net.py --join 127.0.0.1:5005
+
+    python pong_net.py --selftest --latency 80 --jitter 30 --loss 0.1
+"""
+import argparse
+import heapq
+import json
+import math
+import socket
+import struct
+import time
+
+import numpy as np
+
+from game_loop import PHYSICS_TICK_RATE
+
+INPUT_DELAY = 2         # Ticks between sampling a local input and applying it
+MAX_ROLLBACK = 12       # Never run more ticks ahead of the peer's confirmed input than this
+MAX_INPUTS_PER_PACKET = 32
+HANDSHAKE_RETRY = 0.2
+
+HELLO = 1
+START = 2
+INPUTS = 3
+PACKET = struct.Struct('<BII')       # type, first tick, number of the peer's ticks confirmed
+START_PACKET = struct.Struct('<BQ')  # type, seed
+INPUT = struct.Struct('<H')
+NO_INPUT = 0xFFFF                    # Player's face not found this tick
+
+LEFT = 0
+RIGHT = 1
+
+
+def quantize(target):
+    """Paddle target as sent on the wire; both peers simulate the dequantized value"""
+    if target is None:
+        return NO_INPUT
+    return int(round(min(max(target, 0.0), 1.0) * (NO_INPUT - 1)))
+
+
+def dequantize(value):
+    return None if value == NO_INPUT else value / (NO_INPUT - 1)
+
+
+class LossyLink:
+    """Outgoing datagram shaper for testing: adds latency, jitter and random loss"""
+
+    def __init__(self, sock, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.sock = sock
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.rng = np.random.default_rng(seed)
+        self.queue = []
+        self.sequence = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def sendto(self, data, addr, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.rng.random() < self.loss:
+            self.dropped += 1
+            return
+        deliver = now + self.latency + self.rng.uniform(0, self.jitter)
+        heapq.heappush(self.queue, (deliver, self.sequence, data, addr))
+        self.sequence += 1
+        self.flush(now)
+
+    def flush(self, now=None):
+        now = time.perf_counter() if now is None else now
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, addr = heapq.heappop(self.queue)
+            self.sock.sendto(data, addr)
+            self.sent += 1
+
+
+class DirectLink:
+    """No shaping; same interface as LossyLink"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.sent = 0
+        self.dropped = 0
+
+    def sendto(self, data, addr, now=None):
+        self.sock.sendto(data, addr)
+        self.sent += 1
+
+    def flush(self, now=None):
+        pass
+
+
+class NetSession:
+    """Rollback netcode around a PongSim; call update() once per displayed frame.
+
+    The game must be seeded identically on both peers. Its timestep decides
+    how many ticks are due; ticks that would run more than max_rollback ahead
+    of the peer's confirmed inputs are held back until they arrive.
+    """
+
+    def __init__(self, game, side, sock, peer, link=None, seed=None,
+                 input_delay=INPUT_DELAY, max_rollback=MAX_ROLLBACK):
+        self.game = game
+        self.side = side
+        self.sock = sock
+        self.peer = peer
+        self.link = link or DirectLink(sock)
+        self.seed = seed   # Host only: repeated to a client whose START got lost
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+
+        self.inputs = ({}, {})          # Per side: tick -> quantized input
+        self.predicted = {}             # Tick -> remote input assumed when it was simulated
+        self.snapshots = {}             # Tick -> game state before that tick ran
+        self.tick = 0                   # Next tick to simulate
+        # The first input_delay ticks have no input from either side
+        self.remote_confirmed = input_delay - 1     # All remote inputs up to here have arrived
+        self.remote_ack = input_delay - 1           # Peer has all our inputs up to here
+        self.rollback_to = None
+        self.local_input = NO_INPUT
+        for t in range(input_delay):
+            self.inputs[LEFT][t] = self.inputs[RIGHT][t] = NO_INPUT
+
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.stalled = 0
+        self.received = 0
+        self.max_rollback_depth = 0
+
+    def set_local_input(self, target):
+        """Latest paddle target of the local player (normalised, or None)"""
+        self.local_input = quantize(target)
+
+    def remote_input(self, t):
+        remote = self.inputs[1 - self.side]
+        if t in remote:
+            return remote[t]
+        # Predict the peer keeps doing what they last confirmed doing
+        return remote.get(self.remote_confirmed, NO_INPUT)
+
+    def _simulate(self, t):
+        self.snapshots[t] = self.game.snapshot()
+        local = self.inputs[self.side][t]
+        remote = self.remote_input(t)
+        self.predicted[t] = remote
+        left, right = (local, remote) if self.side == LEFT else (remote, local)
+        self.game.save_previous_state()
+        self.game.step(dequantize(left), dequantize(right), dt=self.game.timestep.base_ticks)
+
+    def _rollback(self):
+        start = self.rollback_to
+        self.rollback_to = None
+        if start is None or start >= self.tick:
+            return
+        self.game.restore(self.snapshots[start])
+        for t in range(start, self.tick):
+            self._simulate(t)
+        self.rollbacks += 1
+        self.resimulated += self.tick - start
+        self.max_rollback_depth = max(self.max_rollback_depth, self.tick - start)
+
+    def receive(self, now=None):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                continue   # Windows reports ICMP port unreachable here while the peer starts
+            kind = data[0]
+            if kind == HELLO and self.seed is not None:
+                self.link.sendto(START_PACKET.pack(START, self.seed), addr, now)
+            elif kind == INPUTS:
+                self._read_inputs(data)
+
+    def _read_inputs(self, data):
+        _, first, ack = PACKET.unpack_from(data)
+        self.received += 1
+        self.remote_ack = max(self.remote_ack, ack - 1)
+        remote = self.inputs[1 - self.side]
+        count = (len(data) - PACKET.size) // INPUT.size
+        for i in range(count):
+            t = first + i
+            if t in remote or t <= self.remote_confirmed:
+                continue
+            value = INPUT.unpack_from(data, PACKET.size + i * INPUT.size)[0]
+            remote[t] = value
+            if t < self.tick and self.predicted.get(t) != value:
+                self.rollback_to = t if self.rollback_to is None else min(self.rollback_to, t)
+        while self.remote_confirmed + 1 in remote:
+            self.remote_confirmed += 1
+
+    def send(self, now=None):
+        local = self.inputs[self.side]
+        first = max(self.remote_ack + 1, self.tick + self.input_delay - MAX_INPUTS_PER_PACKET)
+        last = self.tick + self.input_delay   # Exclusive
+        values = [local[t] for t in range(first, last) if t in local]
+        packet = PACKET.pack(INPUTS, first, self.remote_confirmed + 1) + b''.join(INPUT.pack(v) for v in values)
+        self.link.sendto(packet, self.peer, now)
+
+    def _forget(self):
+        # Inputs and snapshots older than anything a rollback can reach
+        horizon = min(self.remote_confirmed, self.remote_ack, self.tick - 1)
+        remote = self.inputs[1 - self.side]
+        for table in (self.snapshots, self.predicted, self.inputs[LEFT], self.inputs[RIGHT]):
+            # The last confirmed remote input is what unconfirmed ticks are predicted from
+            cutoff = min(horizon, self.remote_confirmed - 1) if table is remote else horizon
+            for t in [t for t in table if t <= cutoff]:
+                del table[t]
+
+    def update(self, now=None, stop_at=None):
+        """Exchange inputs, fix mispredictions and run the ticks that are due"""
+        now = time.perf_counter() if now is None else now
+        self.link.flush(now)
+        self.receive(now)
+        self._rollback()
+
+        for _ in range(self.game.timestep.advance(now)):
+            if stop_at is not None and self.tick >= stop_at:
+                break
+            if self.tick - self.remote_confirmed > self.max_rollback:
+                self.stalled += 1
+                continue
+            self.inputs[self.side][self.tick + self.input_delay] = self.local_input
+            self._simulate(self.tick)
+            self.tick += 1
+
+        self.send(now)
+        self._forget()
+
+    def stats(self):
+        return {
+            'tick': self.tick,
+            'remote_confirmed': self.remote_confirmed,
+            'rollbacks': self.rollbacks,
+            'resimulated_ticks': self.resimulated,
+            'max_rollback_depth': self.max_rollback_depth,
+            'stalled_ticks': self.stalled,
+            'packets_sent': self.link.sent,
+            'packets_dropped': self.link.dropped,
+            'packets_received': self.received,
+        }
+
+
+def open_socket(port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('0.0.0.0', port))
+    sock.setblocking(False)
+    return sock
+
+
+def host(port, link, seed, timeout=None):
+    """Wait for a client's HELLO and answer with the seed; returns the client address"""
+    sock = link.sock
+    sock.setblocking(True)
+    sock.settimeout(timeout)
+    try:
+        while True:
+            data, addr = sock.recvfrom(2048)
+            if data and data[0] == HELLO:
+                break
+    finally:
+        sock.setblocking(False)
+    link.sendto(START_PACKET.pack(START, seed), addr)
+    return addr
+
+
+def join(peer, link, timeout=30.0):
+    """Say HELLO until the host answers; returns the shared seed"""
+    sock = link.sock
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        link.sendto(bytes((HELLO,)), peer)
+        retry = time.perf_counter() + HANDSHAKE_RETRY
+        while time.perf_counter() < retry:
+            link.flush()
+            try:
+                data, _ = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError, ConnectionResetError):
+                time.sleep(0.005)
+                continue
+            if data[0] == START:
+                return START_PACKET.unpack_from(data)[1]
+    raise TimeoutError(f"no answer from {peer[0]}:{peer[1]}")
+
+
+def selftest(ticks, latency, jitter, loss, input_delay=INPUT_DELAY, frame_rate=60, seed=1):
+    """Two peers in one process over localhost with shaped links and scripted heads.
+
+    Time is simulated, so this runs far faster than real time. Returns both
+    peers' stats, whether their final states agree and whether the last
+    confirmed remote input, which unconfirmed ticks are predicted from,
+    survived every cleanup.
+    """
+    from pong_core import PongSim
+    from game_loop import FixedTimestep
+
+    def make_game():
+        game = PongSim(1000, 600, 7, 1.8, serve_towards_scorer=False, rng=np.random.default_rng(seed))
+        game.timestep = FixedTimestep(PHYSICS_TICK_RATE)
+        game.timestep.reset(0.0)
+        return game
+
+    socks = [open_socket(), open_socket()]
+    addrs = [('127.0.0.1', s.getsockname()[1]) for s in socks]
+    sessions = []
+    for side in (LEFT, RIGHT):
+        link = LossyLink(socks[side], latency, jitter, loss, seed=side + 10)
+        sessions.append(NetSession(make_game(), side, socks[side], addrs[1 - side], link,
+                                   input_delay=input_delay))
+
+    now = 0.0
+    confirmed_kept = True
+    while True:
+        now += 1.0 / frame_rate
+        for session in sessions:
+            phase = 0.3 if session.side == LEFT else 0.7
+            head = 0.5 + 0.4 * math.sin(2 * math.pi * phase * now + session.side)
+            # Players sometimes step out of view
+            session.set_local_input(None if int(now * 3 + session.side) % 17 == 0 else head)
+            session.update(now, stop_at=ticks)
+            confirmed_kept &= session.remote_confirmed in session.inputs[1 - session.side]
+        done = all(s.tick >= ticks and s.remote_confirmed >= ticks - 1 and s.rollback_to is None
+                   for s in sessions)
+        if done:
+            break
+        time.sleep(0.0005)   # Let localhost deliver what was sent
+
+    for sock in socks:
+        sock.close()
+    return {
+        'ticks': ticks,
+        'latency_ms': latency * 1000,
+        'jitter_ms': jitter * 1000,
+        'loss': loss,
+        'simulated_seconds': now,
+        'in_sync': sessions[0].game.snapshot() == sessions[1].game.snapshot(),
+        'confirmed_input_kept': confirmed_kept,
+        'score': [sessions[0].game.left_score, sessions[0].game.right_score],
+        'left': sessions[0].stats(),
+        'right': sessions[1].stats(),
+    }
+
+
+def main():
+    from detector_backends import select_backend, BACKEND_CHOICES
+
+    parser = argparse.ArgumentParser(description="Two player pong over the network")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--host', type=int, metavar='PORT', help="wait for a player; you're the left paddle")
+    mode.add_argument('--join', metavar='HOST:PORT', help="join a host; you're the right paddle")
+    mode.add_argument('--selftest', action='store_true', help="two simulated peers over localhost")
+    parser.add_argument('--input-delay', type=int, default=INPUT_DELAY, help="ticks")
+    parser.add_argument('--latency', type=float, default=0, help="added one-way latency in ms")
+    parser.add_argument('--jitter', type=float, default=0, help="added random latency in ms")
+    parser.add_argument('--loss', type=float, default=0, help="fraction of packets dropped")
+    parser.add_argument('--ticks', type=int, default=1800, help="selftest length")
+    parser.add_argument('--detector', choices=BACKEND_CHOICES, default='auto', help="face detector backend")
+    parser.add_argument('--cascade', action='store_true', help="gate the detector with a cheaper one")
+    args = parser.parse_args()
+    latency, jitter = args.latency / 1000, args.jitter / 1000
+
+    if args.selftest:
+        print(json.dumps(selftest(args.ticks, latency, jitter, args.loss, args.input_delay), indent=2))
+        return
+
+    import cv2
+    from display_service import DisplayService
+    from head_input import HeadPredictor
+    from pong_replay import new_seed
+    from two_player_pong import TwoPlayerPong, PLAYING, WINDOW_NAME
+
+    sock = open_socket(args.host or 0)
+    shaped = latency > 0 or jitter > 0 or args.loss > 0
+    link = LossyLink(sock, latency, jitter, args.loss) if shaped else DirectLink(sock)
+    if args.host is not None:
+        seed = new_seed()
+        print(f"Waiting for the other player on port {args.host}...")
+        peer = host(args.host, link, seed)
+        side = LEFT
+    else:
+        address, port = args.join.rsplit(':', 1)
+        peer = (socket.gethostbyname(address), int(port))
+        seed = join(peer, link)
+        side = RIGHT
+    print(f"Connected to {peer[0]}:{peer[1]}; you are the {'left' if side == LEFT else 'right'} paddle")
+
+    game = TwoPlayerPong(seed=seed)
+    game.start()
+    session = NetSession(game, side, sock, peer, link, seed=seed if side == LEFT else None,
+                         input_delay=args.input_delay)
+
+    # One face per machine, and only its nose tip matters
+    face_detector = select_backend({1}, args.detector, args.cascade)
+    predictor = HeadPredictor()
+    cap = cv2.VideoCapture(0)
+    display = DisplayService()
+    display.add_window(WINDOW_NAME)
+    display.start()
+    running = True
+
+    while running and game.game_state == PLAYING:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        capture_time = time.perf_counter()
+        frame = cv2.flip(frame, 1)
+
+        results = face_detector.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if results.multi_face_landmarks:
+            predictor.observe(results.multi_face_landmarks[0].landmark[1].y, capture_time)
+            session.set_local_input(predictor.predict())
+        else:
+            session.set_local_input(None)
+
+        session.update()
+        display.show(WINDOW_NAME, game.draw(frame), stamp=capture_time)
+        latency_seen = display.latency(WINDOW_NAME)
+        if latency_seen is not None:
+            predictor.record_latency(latency_seen)
+
+        for key in display.keys():
+            running = game.handle_key(key) and running
+
+    cap.release()
+    display.close()
+    face_detector.close()
+    sock.close()
+    print(json.dumps(session.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
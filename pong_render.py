@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+from overlay_sprites import SpriteCache, shadowed_text_passes
+
+BACKGROUND_DIM = 0.6         # Camera brightness behind the game
+GRADIENT_COLOR = (40, 100, 40)
+GRADIENT_WEIGHT = 0.6
+START_CAMERA_WEIGHT = 0.7
+
+# Text styles as sprite passes: (dx, dy, color, thickness, line_type)
+WHITE = (255, 255, 255)
+SCORE_PASSES = shadowed_text_passes(WHITE, 2, 4)
+TITLE_PASSES = [(-offset, 0, (0, 255 - offset*30, 0), 5-offset, cv2.LINE_8) for offset in range(3)]
+TITLE_PASSES.append((0, 0, WHITE, 2, cv2.LINE_8))
+BUTTON_TEXT_PASSES = [(0, 0, WHITE, 2, cv2.LINE_8)]
+
+
+def status_passes(color):
+    return shadowed_text_passes(color, 2, 3)
+
+
+class RenderContext:
+    """Canvas and static layers for one pong window, allocated once and reused.
+
+    The canvas returned by the background methods is overwritten on the next
+    call, so show or copy it before drawing the following frame.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.canvas = np.zeros((height, width, 3), dtype=np.uint8)
+
+        # Vertical green gradient for the start screen, built once
+        ramp = np.arange(height, dtype=np.float64) / height
+        self.gradient = np.empty((height, width, 3), dtype=np.uint8)
+        self.gradient[:] = (ramp[:, None] * np.array(GRADIENT_COLOR)).astype(np.uint8)[:, None, :]
+
+        # Text is rasterized once per distinct string and blitted into its own box
+        self.sprites = SpriteCache()
+
+    def dimmed_background(self, frame):
+        """Camera frame scaled into the canvas and dimmed in place"""
+        cv2.resize(frame, (self.width, self.height), dst=self.canvas)
+        cv2.convertScaleAbs(self.canvas, dst=self.canvas, alpha=BACKGROUND_DIM)
+        return self.canvas
+
+    def gradient_background(self, frame):
+        """Camera frame blended with the cached start-screen gradient"""
+        cv2.resize(frame, (self.width, self.height), dst=self.canvas)
+        cv2.addWeighted(self.gradient, GRADIENT_WEIGHT, self.canvas, START_CAMERA_WEIGHT, 0,
+                        dst=self.canvas)
+        return self.canvas
+
+    def text(self, dst, text, pos, scale, passes):
+        """Blit cached text at a putText origin; only re-rasterized when the string changes"""
+        self.sprites.text(text, scale, passes).blit(dst, pos)
+
+    def start_button(self, dst, center_x, top):
+        cv2.rectangle(dst, (center_x - 100, top), (center_x + 100, top + 60), (0, 200, 0), -1)
+        cv2.rectangle(dst, (center_x - 100, top), (center_x + 100, top + 60), (0, 255, 0), 2)
+        self.text(dst, "SPACE to Start", (center_x - 90, top + 40), 1, BUTTON_TEXT_PASSES)
@@ -0,0 +1,226 @@
+"""Deterministic pong session recording and replay.
+
+A session file is a small header (game class, RNG seed, tick length)
+followed by a stream of records in the order they happened live:
+
+    TICK   the paddle targets fed to one physics step (present ones only)
+    FRAME  end of a displayed frame: timestamp, render alpha, ready flags
+    KEY    a key press handed to the game
+    END    final scores and ball position, to check a replay against
+
+Replaying the stream through the same PongSim.step and handle_key calls
+reproduces the game exactly, independent of camera, tracking or timing.
+
+    python pong_replay.py session.pong                # headless, max speed
+    python pong_replay.py session.pong --render       # also time drawing
+    python pong_replay.py session.pong --realtime --show
+"""
+import argparse
+import importlib
+import json
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+MAGIC = b'PONG'
+VERSION = 1
+HEADER = struct.Struct('<4sBdQB')        # magic, version, tick length, seed, class name length
+FRAME = struct.Struct('<ff')             # seconds since recording started, render alpha
+END = struct.Struct('<iidd')             # left score, right score, ball x, ball y
+TARGET = struct.Struct('<d')
+
+# Record types live in the high nibble; the low nibble carries flags
+TICK_RECORD = 0x10      # bit 0: left target follows, bit 1: right target follows
+FRAME_RECORD = 0x20     # bits 0-3: the game's READY_FLAGS
+KEY_RECORD = 0x30
+END_RECORD = 0x40
+
+
+# Game classes by name, for recordings whose header still says __main__
+GAME_MODULES = {'PongGame': 'forehead_pong', 'TwoPlayerPong': 'two_player_pong'}
+
+
+def new_seed():
+    return int(np.random.SeedSequence().generate_state(1, np.uint64)[0])
+
+
+def game_class_name(game):
+    """module:class of a game, naming the real module when the game was started as a script"""
+    cls = type(game)
+    module = cls.__module__
+    if module == '__main__':
+        main = sys.modules['__main__']
+        spec = getattr(main, '__spec__', None)
+        if spec is not None:
+            module = spec.name                  # python -m forehead_pong
+        else:
+            module = os.path.splitext(os.path.basename(main.__file__))[0]
+    return f"{module}:{cls.__name__}"
+
+
+class SessionRecorder:
+    """Logs a game's ticks, frames and keys; attach with game.recorder = SessionRecorder(...)"""
+
+    def __init__(self, path, game):
+        self.game = game
+        self.file = open(path, 'wb')
+        self.start = None
+        name = game_class_name(game).encode()
+        self.file.write(HEADER.pack(MAGIC, VERSION, game.timestep.base_ticks, game.seed, len(name)))
+        self.file.write(name)
+
+    def tick(self, left_target, right_target):
+        mask = (left_target is not None) | ((right_target is not None) << 1)
+        self.file.write(bytes((TICK_RECORD | mask,)))
+        if left_target is not None:
+            self.file.write(TARGET.pack(left_target))
+        if right_target is not None:
+            self.file.write(TARGET.pack(right_target))
+
+    def frame(self, now=None):
+        now = time.perf_counter() if now is None else now
+        if self.start is None:
+            self.start = now
+        flags = 0
+        for bit, name in enumerate(self.game.READY_FLAGS):
+            flags |= bool(getattr(self.game, name)) << bit
+        self.file.write(bytes((FRAME_RECORD | flags,)))
+        self.file.write(FRAME.pack(now - self.start, self.game.timestep.alpha))
+
+    def key(self, key):
+        self.file.write(bytes((KEY_RECORD, key & 0xFF)))
+
+    def close(self):
+        game = self.game
+        self.file.write(bytes((END_RECORD,)))
+        self.file.write(END.pack(game.left_score, game.right_score, *game.ball_pos))
+        self.file.close()
+
+
+class Session:
+    """A recording loaded into memory"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        magic, version, self.dt, self.seed, name_len = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} pong session")
+        offset = HEADER.size
+        self.game_class = data[offset:offset + name_len].decode()
+        self.module = None
+        self.data = data
+        self.offset = offset + name_len
+
+    def records(self):
+        """Yield (kind, payload) in recorded order"""
+        data, pos = self.data, self.offset
+        while pos < len(data):
+            tag = data[pos]
+            kind, flags = tag & 0xF0, tag & 0x0F
+            pos += 1
+            if kind == TICK_RECORD:
+                targets = []
+                for bit in (1, 2):
+                    if flags & bit:
+                        targets.append(TARGET.unpack_from(data, pos)[0])
+                        pos += TARGET.size
+                    else:
+                        targets.append(None)
+                yield kind, targets
+            elif kind == FRAME_RECORD:
+                yield kind, (flags, *FRAME.unpack_from(data, pos))
+                pos += FRAME.size
+            elif kind == KEY_RECORD:
+                yield kind, data[pos]
+                pos += 1
+            elif kind == END_RECORD:
+                yield kind, END.unpack_from(data, pos)
+                pos += END.size
+            else:
+                raise ValueError(f"corrupt session record {tag:#x} at byte {pos - 1}")
+
+    def new_game(self):
+        module, name = self.game_class.split(':')
+        if module == '__main__':
+            module = GAME_MODULES[name]
+        self.module = importlib.import_module(module)
+        return getattr(self.module, name)(seed=self.seed)
+
+
+def replay(path, render=False, realtime=False, display=None, camera_size=(640, 480)):
+    """Drive a fresh game from a session file and return timing and outcome stats.
+
+    Headless by default; render draws every frame onto a blank camera image,
+    realtime paces frames at their recorded timestamps and display (a
+    DisplayService) shows them.
+    """
+    session = Session(path)
+    game = session.new_game()
+    camera = np.zeros((camera_size[1], camera_size[0], 3), dtype=np.uint8)
+    stats = {'game': session.game_class, 'seed': session.seed, 'ticks': 0, 'frames': 0,
+             'keys': 0, 'sim_seconds': 0.0, 'render_seconds': 0.0}
+    expected = None
+    start = time.perf_counter()
+
+    for kind, payload in session.records():
+        if kind == TICK_RECORD:
+            t0 = time.perf_counter()
+            game.save_previous_state()
+            game.step(payload[0], payload[1], dt=session.dt)
+            stats['sim_seconds'] += time.perf_counter() - t0
+            stats['ticks'] += 1
+        elif kind == FRAME_RECORD:
+            flags, timestamp, alpha = payload
+            for bit, name in enumerate(game.READY_FLAGS):
+                setattr(game, name, bool(flags >> bit & 1))
+            game.timestep.accumulator = alpha * game.timestep.dt
+            stats['frames'] += 1
+            if realtime:
+                delay = start + timestamp - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if render or display is not None:
+                t0 = time.perf_counter()
+                screen = game.draw_frame(camera)
+                stats['render_seconds'] += time.perf_counter() - t0
+                if display is not None:
+                    display.show(session.module.WINDOW_NAME, screen)
+        elif kind == KEY_RECORD:
+            stats['keys'] += 1
+            game.handle_key(payload)
+        elif kind == END_RECORD:
+            expected = payload
+
+    stats['wall_seconds'] = time.perf_counter() - start
+    stats['score'] = [game.left_score, game.right_score]
+    if expected is not None:
+        stats['matches_recording'] = expected == (game.left_score, game.right_score, *game.ball_pos)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded pong session")
+    parser.add_argument('session')
+    parser.add_argument('--render', action='store_true', help="draw every frame to time rendering")
+    parser.add_argument('--realtime', action='store_true', help="pace frames at their recorded times")
+    parser.add_argument('--show', action='store_true', help="display the replay (implies --render)")
+    args = parser.parse_args()
+
+    display = None
+    if args.show:
+        from display_service import DisplayService
+        display = DisplayService().start()
+    try:
+        stats = replay(args.session, render=args.render, realtime=args.realtime, display=display)
+    finally:
+        if display is not None:
+            display.close()
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
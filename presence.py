@@ -0,0 +1,99 @@
+import time
+
+ACTIVE = 'active'
+IDLE = 'idle'
+
+IDLE_AFTER = 10.0       # Seconds without a face before dropping to the presence scan
+IDLE_FPS = 2.0          # Presence scans per second while idle
+IDLE_SCALE = 0.25       # Resolution of the presence scan relative to the camera frame
+MAX_STALE_FRAMES = 10   # Most frames a driver is expected to queue while the loop sleeps
+FRESH_GRAB_WAIT = 0.008 # A grab that blocks this long waited for a new frame
+
+
+class PresenceMonitor:
+    """Switches to a cheap presence scan after a stretch without faces, and back on the first one"""
+
+    def __init__(self, idle_after=IDLE_AFTER, idle_fps=IDLE_FPS, idle_scale=IDLE_SCALE, log=print):
+        self.idle_after = idle_after
+        self.idle_interval = 1.0 / idle_fps
+        self.idle_scale = idle_scale
+        self.log = log
+        self.mode = ACTIVE
+        self.last_seen = None
+        self.last_scan = None
+
+    def update(self, face_found, now=None):
+        """Report whether this frame had a face; returns the mode for the next frame"""
+        now = time.perf_counter() if now is None else now
+        if self.last_seen is None or face_found:
+            self.last_seen = now
+        if self.mode == IDLE and face_found:
+            self.mode = ACTIVE
+            self.log("Presence: face detected, back to full rate")
+        elif self.mode == ACTIVE and now - self.last_seen >= self.idle_after:
+            self.mode = IDLE
+            self.log(f"Presence: no face for {self.idle_after:.0f}s, idling at "
+                     f"{1.0 / self.idle_interval:.1f} scans/s")
+        return self.mode
+
+    def scan_delay(self, now=None):
+        """Seconds to wait before the next idle scan"""
+        now = time.perf_counter() if now is None else now
+        if self.last_scan is None:
+            self.last_scan = now
+            return 0.0
+        delay = self.last_scan + self.idle_interval - now
+        self.last_scan = max(now, self.last_scan + self.idle_interval)
+        return max(delay, 0.0)
+
+
+def drain_stale_frames(cap, max_frames=MAX_STALE_FRAMES, fresh_wait=FRESH_GRAB_WAIT):
+    """Discard frames the driver buffered during an idle sleep; returns how many were grabbed.
+
+    Buffered frames come back from grab() at once, without decoding. The
+    first grab that has to wait is a frame captured now, so the read after
+    this one sees the scene as it is rather than as it was seconds ago.
+    """
+    for grabbed in range(1, max_frames + 1):
+        start = time.perf_counter()
+        if not cap.grab() or time.perf_counter() - start >= fresh_wait:
+            return grabbed
+    return max_frames
+
+
+class DutyCycleMeter:
+    """Process CPU seconds per wall-clock second, split by mode: a proxy for power draw.
+
+    process_time() counts every thread of the process, MediaPipe's included.
+    """
+
+    def __init__(self, mode=ACTIVE):
+        self.totals = {}
+        self.mode = mode
+        self.wall_mark = time.perf_counter()
+        self.cpu_mark = time.process_time()
+
+    def switch(self, mode):
+        if mode == self.mode:
+            return
+        self._accumulate()
+        self.mode = mode
+
+    def _accumulate(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        total = self.totals.setdefault(self.mode, [0.0, 0.0])
+        total[0] += wall - self.wall_mark
+        total[1] += cpu - self.cpu_mark
+        self.wall_mark, self.cpu_mark = wall, cpu
+
+    def report(self):
+        """{mode: {'seconds', 'cpu_seconds', 'busy_per_second'}} up to now"""
+        self._accumulate()
+        return {mode: {'seconds': wall, 'cpu_seconds': cpu,
+                       'busy_per_second': cpu / wall if wall > 0 else 0.0}
+                for mode, (wall, cpu) in self.totals.items()}
+
+    def print_report(self):
+        for mode, stats in self.report().items():
+            print(f"{mode.title()}: {stats['busy_per_second']:.2f} CPU-seconds per second "
+                  f"over {stats['seconds']:.0f}s")
@@ -0,0 +1,85 @@
+from collections import deque
+
+import numpy as np
+
+# (inference scale, refine landmarks), best first; the top level is the old fixed setting
+QUALITY_LEVELS = [
+    (1.0, True),
+    (1.0, False),
+    (0.75, False),
+    (0.5, False),
+    (0.35, False),
+]
+
+DOWN_RATIO = 1.0        # Step down when the typical frame exceeds the budget
+UP_RATIO = 0.6          # Step up only when it fits in this fraction of the budget
+WINDOW = 30             # Frames measured before any decision
+MIN_UP_HOLD = 90        # Frames a level must run comfortably before stepping up
+MAX_UP_HOLD = 1800
+
+
+class QualityGovernor:
+    """Steps quality down when frame time runs over budget and back up when there's headroom.
+
+    Decisions use the median of the last `window` frames, and a change waits
+    for a fresh window, so one slow frame never flips the level. Stepping back
+    up needs a comfortable margin held for up_hold frames, and that hold
+    doubles whenever an upgrade has to be undone, so a machine sitting right
+    at the edge settles instead of oscillating.
+    """
+
+    def __init__(self, budget, levels=QUALITY_LEVELS, start=0, window=WINDOW,
+                 down_ratio=DOWN_RATIO, up_ratio=UP_RATIO, log=print):
+        self.budget = budget
+        self.levels = levels
+        self.level = start
+        self.window = window
+        self.down_ratio = down_ratio
+        self.up_ratio = up_ratio
+        self.log = log
+        self.times = deque(maxlen=window)
+        self.up_hold = MIN_UP_HOLD
+        self.comfortable = 0
+        self.just_upgraded = False
+        self.changes = 0
+
+    @property
+    def current(self):
+        return self.levels[self.level]
+
+    def describe(self, level=None):
+        scale, refine = self.levels[self.level if level is None else level]
+        return f"{scale:.0%} inference resolution, refinement {'on' if refine else 'off'}"
+
+    def record(self, seconds):
+        """Feed one frame's processing time; returns True when the level changed"""
+        self.times.append(seconds)
+        if len(self.times) < self.window:
+            return False
+        typical = float(np.median(self.times))
+
+        if typical > self.budget * self.down_ratio and self.level < len(self.levels) - 1:
+            if self.just_upgraded:
+                self.up_hold = min(self.up_hold * 2, MAX_UP_HOLD)
+            self._change(self.level + 1, typical)
+            return True
+
+        self.just_upgraded = False
+        if typical < self.budget * self.up_ratio and self.level > 0:
+            self.comfortable += 1
+            if self.comfortable >= self.up_hold:
+                self._change(self.level - 1, typical)
+                self.just_upgraded = True
+                return True
+        else:
+            self.comfortable = 0
+        return False
+
+    def _change(self, level, typical):
+        direction = "down" if level > self.level else "up"
+        self.log(f"Quality {direction}: {self.describe(level)} "
+                 f"(median frame {typical * 1000:.1f}ms, budget {self.budget * 1000:.1f}ms)")
+        self.level = level
+        self.times.clear()
+        self.comfortable = 0
+        self.changes += 1
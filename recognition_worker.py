@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Overlay states for a track
+STATUS_UNKNOWN = "unknown"
+STATUS_FRIENDLY = "friendly"
+STATUS_PENDING = "pending"
+
+
+# Seconds before a crop the quality gate rejected is retried for the same track
+GATE_BACKOFF = 0.25
+
+
+class RecognitionPool:
+    """Runs FaceDatabase.is_friendly on worker threads so the render loop never waits on it"""
+
+    def __init__(self, face_db, workers=2, max_pending=4, gate_backoff=GATE_BACKOFF):
+        self.face_db = face_db
+        self.max_pending = max_pending
+        self.gate_backoff = gate_backoff
+        self.pending = OrderedDict()   # track_id -> (crop, pose, future), oldest first
+        self.in_flight = set()
+        self.forgotten = set()         # In-flight tracks whose result is no longer wanted
+        self.last_status = {}          # track_id -> (status, timestamp)
+        self.last_gated = {}           # track_id -> timestamp the quality gate last rejected its crop
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.lock = threading.Condition()
+        self.running = True
+        self.threads = [threading.Thread(target=self._worker, daemon=True)
+                        for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def needs_refresh(self, track_id, now=None):
+        """True when the track has no fresh result and nothing queued for it"""
+        now = time.perf_counter() if now is None else now
+        with self.lock:
+            if track_id in self.pending or track_id in self.in_flight:
+                return False
+            entry = self.last_status.get(track_id)
+            gated = self.last_gated.get(track_id)
+        if gated is not None and now - gated < self.gate_backoff:
+            return False
+        return entry is None or now - entry[1] > self.face_db.cache_duration
+
+    def submit(self, track_id, crop, pose=None):
+        """Queue a crop for recognition and return a Future resolving to True/False.
+
+        A newer crop for the same track replaces the queued one, and when the
+        queue is full the oldest request is dropped, so results never lag far
+        behind the live frame. The future resolves to None when the quality
+        gate rejected the crop; the track then keeps its previous status and
+        needs_refresh() holds off for gate_backoff seconds.
+        """
+        future = Future()
+        with self.lock:
+            stale = self.pending.pop(track_id, None)
+            if stale is None and len(self.pending) >= self.max_pending:
+                _, stale = self.pending.popitem(last=False)
+            if stale is not None:
+                stale[-1].cancel()
+                self.dropped += 1
+            self.pending[track_id] = (crop, pose, future)
+            self.submitted += 1
+            self.lock.notify()
+        return future
+
+    def status(self, track_id):
+        """Last known status for a track; unseen tracks report pending while queued"""
+        with self.lock:
+            entry = self.last_status.get(track_id)
+            if entry is not None:
+                return entry[0]
+            if track_id in self.pending or track_id in self.in_flight:
+                return STATUS_PENDING
+        return STATUS_UNKNOWN
+
+    def forget(self, track_id):
+        """Drop everything known about a track that left the frame"""
+        with self.lock:
+            self.last_status.pop(track_id, None)
+            self.last_gated.pop(track_id, None)
+            entry = self.pending.pop(track_id, None)
+            if entry is not None:
+                entry[-1].cancel()
+            if track_id in self.in_flight:
+                self.forgotten.add(track_id)
+
+    def _worker(self):
+        while True:
+            with self.lock:
+                while self.running and not self.pending:
+                    self.lock.wait()
+                if not self.running:
+                    return
+                track_id, (crop, pose, future) = self.pending.popitem(last=False)
+                self.in_flight.add(track_id)
+
+            friendly = gated = None
+            if future.set_running_or_notify_cancel():
+                try:
+                    friendly = self.face_db.is_friendly(crop, track_id, pose)
+                    gated = friendly is None
+                    future.set_result(friendly)
+                except Exception as e:
+                    future.set_exception(e)
+
+            with self.lock:
+                self.in_flight.discard(track_id)
+                if track_id in self.forgotten:
+                    self.forgotten.discard(track_id)
+                elif friendly is not None:
+                    status = STATUS_FRIENDLY if friendly else STATUS_UNKNOWN
+                    self.last_status[track_id] = (status, time.perf_counter())
+                    self.last_gated.pop(track_id, None)
+                    self.completed += 1
+                elif gated:
+                    # Don't resubmit the same blurry or turned face on every frame
+                    self.last_gated[track_id] = time.perf_counter()
+
+    def close(self):
+        with self.lock:
+            self.running = False
+            for entry in self.pending.values():
+                entry[-1].cancel()
+            self.pending.clear()
+            self.lock.notify_all()
+        for t in self.threads:
+            t.join(timeout=1.0)
@@ -1,107 +1,165 @@
+import argparse
 import cv2
-import mediapipe as mp
 import numpy as np
 import time
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from game_loop import FixedTimestep, PHYSICS_TICK_RATE
+from detector_backends import select_backend, BACKEND_CHOICES
+from frame_trace import Tracer
+from display_service import DisplayService, DISPLAY_FPS, SECONDARY_FPS
+from head_input import HeadPredictor, TimeConstantSmoother
+from pong_replay import SessionRecorder, new_seed
+from pong_core import PongSim, PADDLE_WIDTH, PADDLE_HEIGHT, BALL_SIZE
+from pong_render import RenderContext, SCORE_PASSES, TITLE_PASSES, status_passes
 
-# Initialize MediaPipe Face Mesh with optimized settings
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=2,
-    refine_landmarks=True,
-    min_detection_confidence=0.6,
-    min_tracking_confidence=0.6
-)
+# Paddles only follow the nose tips, so any detector providing them will do
+REQUIRED_LANDMARKS = {1}
+DETECTION_CONFIDENCE = 0.6
 
 # Optimized game settings
 WINDOW_WIDTH = 1000
 WINDOW_HEIGHT = 600
-PADDLE_WIDTH = 15
-PADDLE_HEIGHT = 90
-BALL_SIZE = 15
 BALL_SPEED = 7
 HEAD_CONTROL_SENSITIVITY = 1.8
 
+WINDOW_NAME = 'Two Player Pong'
+VIEW_NAME = 'Players View'
+
 # Game states
 START_SCREEN = 0
 PLAYING = 1
 PAUSED = 2
 
-class TwoPlayerPong:
-    def __init__(self):
-        self.ball_pos = [WINDOW_WIDTH//2, WINDOW_HEIGHT//2]
-        self.ball_vel = [BALL_SPEED, BALL_SPEED]
-        self.left_paddle = WINDOW_HEIGHT//2
-        self.right_paddle = WINDOW_HEIGHT//2
-        self.left_score = 0
-        self.right_score = 0
+# Split-frame mode: how far each half's search reaches past the centre line, as a
+# frame fraction, so a face straddling the line is still found whole
+SPLIT_OVERLAP = 0.1
+
+class SplitFrameTracker:
+    """One single-face detector per frame half, run in parallel and bound to a paddle.
+
+    The left half always drives the left paddle and the right half the right
+    one, so players never swap when they cross, and each detector only
+    searches half the pixels for a single face. The searched halves overlap
+    at the centre, but a face only counts for the side its nose is on, so
+    one player in the middle never drives both paddles.
+    """
+
+    def __init__(self, overlap=SPLIT_OVERLAP, detector='auto', cascade=False, tracer=None):
+        self.overlap = overlap
+        self.tracer = tracer or Tracer()
+        self.detectors = [select_backend(REQUIRED_LANDMARKS, detector, cascade, max_faces=1,
+                                      detection_confidence=DETECTION_CONFIDENCE,
+                                      tracking_confidence=DETECTION_CONFIDENCE)
+                       for _ in range(2)]
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.buffers = [None, None]
+
+    def halves(self, frame_w):
+        split = frame_w // 2
+        reach = int(frame_w * self.overlap)
+        return [(0, min(frame_w, split + reach)), (max(0, split - reach), frame_w)]
+
+    def _locate(self, side, frame, x0, x1, split):
+        # RGB conversion writes straight into a reused contiguous buffer for this half
+        shape = (frame.shape[0], x1 - x0, 3)
+        if self.buffers[side] is None or self.buffers[side].shape != shape:
+            self.buffers[side] = np.empty(shape, dtype=np.uint8)
+        rgb = cv2.cvtColor(frame[:, x0:x1], cv2.COLOR_BGR2RGB, dst=self.buffers[side])
+        with self.tracer.span(('left', 'right')[side]):
+            results = self.detectors[side].process(rgb)
+        if not results.multi_face_landmarks:
+            return None
+        nose_tip = results.multi_face_landmarks[0].landmark[1]
+        x = int(x0 + nose_tip.x * (x1 - x0))
+        if (x >= split) if side == 0 else (x < split):
+            return None   # The other player's half
+        return x, nose_tip.y
+
+    def process(self, frame):
+        """[(x px, y normalised) or None] for the left and right players"""
+        (lx0, lx1), (rx0, rx1) = self.halves(frame.shape[1])
+        split = frame.shape[1] // 2
+        # MediaPipe releases the GIL while it runs, so the halves overlap in time
+        left = self.executor.submit(self._locate, 0, frame, lx0, lx1, split)
+        right = self._locate(1, frame, rx0, rx1, split)
+        return [left.result(), right]
+
+    def close(self):
+        self.executor.shutdown()
+        for detector in self.detectors:
+            detector.close()
+
+class TwoPlayerPong(PongSim):
+    READY_FLAGS = ('left_player_ready', 'right_player_ready')   # Captured by session recordings
+
+    def __init__(self, tick_rate=PHYSICS_TICK_RATE, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        super().__init__(WINDOW_WIDTH, WINDOW_HEIGHT, BALL_SPEED, HEAD_CONTROL_SENSITIVITY,
+                         serve_towards_scorer=False, rng=np.random.default_rng(self.seed))
+        self.recorder = None
         self.game_state = START_SCREEN
         self.left_player_ready = False
         self.right_player_ready = False
-        self.smooth_left_y = deque(maxlen=5)
-        self.smooth_right_y = deque(maxlen=5)
-        
-    def update(self, left_y=None, right_y=None):
+        self.smooth_left_y = TimeConstantSmoother()
+        self.smooth_right_y = TimeConstantSmoother()
+        self.left_predictor = HeadPredictor()
+        self.right_predictor = HeadPredictor()
+        self.predict_input = True   # Extrapolate to display time instead of averaging
+        self.timestep = FixedTimestep(tick_rate)
+        self.render = RenderContext(WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    def start(self):
+        self.game_state = PLAYING
+        self.timestep.reset()
+        self.save_previous_state()
+
+    def update(self, left_y=None, right_y=None, now=None, capture_time=None):
+        """Advance the game to `now` in fixed physics ticks"""
         if self.game_state == PAUSED:
             return
-            
-        # Smooth paddle movement
+
+        # Head input arrives at the tracking rate, independent of the tick rate
+        if capture_time is None:
+            capture_time = time.perf_counter()
         if left_y is not None:
-            self.smooth_left_y.append(left_y)
-            avg_left_y = sum(self.smooth_left_y) / len(self.smooth_left_y)
-            target_left_y = avg_left_y * WINDOW_HEIGHT
-            self.left_paddle += (target_left_y - self.left_paddle) * HEAD_CONTROL_SENSITIVITY * 0.1
-            
+            self.smooth_left_y.observe(left_y, capture_time)
+            self.left_predictor.observe(left_y, capture_time)
         if right_y is not None:
-            self.smooth_right_y.append(right_y)
-            avg_right_y = sum(self.smooth_right_y) / len(self.smooth_right_y)
-            target_right_y = avg_right_y * WINDOW_HEIGHT
-            self.right_paddle += (target_right_y - self.right_paddle) * HEAD_CONTROL_SENSITIVITY * 0.1
-            
-        # Ball movement with trail effect
-        self.ball_pos[0] += self.ball_vel[0]
-        self.ball_pos[1] += self.ball_vel[1]
-        
-        # Enhanced collision detection with better physics
-        if self.ball_pos[1] <= BALL_SIZE or self.ball_pos[1] >= WINDOW_HEIGHT - BALL_SIZE:
-            self.ball_vel[1] *= -1.02  # Slightly increase speed on bounces
-            
-        # Left paddle collision with improved physics
-        if (self.ball_pos[0] - BALL_SIZE <= PADDLE_WIDTH and 
-            self.left_paddle - PADDLE_HEIGHT//2 <= self.ball_pos[1] <= self.left_paddle + PADDLE_HEIGHT//2):
-            hit_pos = (self.ball_pos[1] - self.left_paddle) / (PADDLE_HEIGHT/2)
-            self.ball_vel[0] = abs(self.ball_vel[0]) * 1.05  # Speed up slightly
-            self.ball_vel[1] += hit_pos * 2  # Add angle based on hit position
-            
-        # Right paddle collision with improved physics
-        if (self.ball_pos[0] + BALL_SIZE >= WINDOW_WIDTH - PADDLE_WIDTH and 
-            self.right_paddle - PADDLE_HEIGHT//2 <= self.ball_pos[1] <= self.right_paddle + PADDLE_HEIGHT//2):
-            hit_pos = (self.ball_pos[1] - self.right_paddle) / (PADDLE_HEIGHT/2)
-            self.ball_vel[0] = -abs(self.ball_vel[0]) * 1.05  # Speed up slightly
-            self.ball_vel[1] += hit_pos * 2  # Add angle based on hit position
-            
-        # Normalize ball velocity to prevent extreme angles
-        speed = np.sqrt(self.ball_vel[0]**2 + self.ball_vel[1]**2)
-        if speed > BALL_SPEED * 2:
-            self.ball_vel = [v * (BALL_SPEED * 2 / speed) for v in self.ball_vel]
-            
-        # Score points
-        if self.ball_pos[0] <= 0:
-            self.right_score += 1
-            self.reset_ball(-1)  # Launch towards left
-        elif self.ball_pos[0] >= WINDOW_WIDTH:
-            self.left_score += 1
-            self.reset_ball(1)  # Launch towards right
-
-    def reset_ball(self, direction=None):
-        self.ball_pos = [WINDOW_WIDTH//2, WINDOW_HEIGHT//2]
-        angle = np.random.uniform(-0.5, 0.5)  # Random angle
-        if direction is None:
-            direction = 1 if np.random.random() > 0.5 else -1
-        self.ball_vel = [
-            BALL_SPEED * direction * np.cos(angle),
-            BALL_SPEED * np.sin(angle)
-        ]
+            self.smooth_right_y.observe(right_y, capture_time)
+            self.right_predictor.observe(right_y, capture_time)
+        left_target = self.head_target(self.smooth_left_y, self.left_predictor)
+        right_target = self.head_target(self.smooth_right_y, self.right_predictor)
+
+        for _ in range(self.timestep.advance(now)):
+            self.save_previous_state()
+            self.step(left_target, right_target, dt=self.timestep.base_ticks)
+            if self.recorder is not None:
+                self.recorder.tick(left_target, right_target)
+
+    def handle_key(self, key):
+        """Apply a key press; returns False when the game should quit"""
+        if key == ord('q'):
+            return False
+        if (key == ord(' ') and self.game_state == START_SCREEN
+                and self.left_player_ready and self.right_player_ready):
+            self.start()
+        return True
+
+    def draw_frame(self, frame):
+        """Whatever the current state shows"""
+        if self.game_state == START_SCREEN:
+            return self.draw_start_screen(frame, self.left_player_ready + self.right_player_ready)
+        return self.draw(frame)
+
+    def head_target(self, smoother, predictor):
+        if not self.predict_input:
+            return smoother.value
+        target = predictor.predict()
+        return None if target is None else min(max(target, 0.0), 1.0)
+
+    def record_latency(self, seconds):
+        self.left_predictor.record_latency(seconds)
+        self.right_predictor.record_latency(seconds)
 
     def draw_paddle_with_glow(self, game_frame, x, y, color):
         # Create paddle glow effect
@@ -113,181 +171,189 @@ class TwoPlayerPong:
                          (x + thickness, int(y + PADDLE_HEIGHT//2)),
                          color, -1)
 
-    def draw_ball_with_trail(self, game_frame):
+    def draw_ball_with_trail(self, game_frame, ball_pos):
         # Draw ball trail effect
         for i in range(3):
-            pos = [int(self.ball_pos[0] - self.ball_vel[0] * i),
-                   int(self.ball_pos[1] - self.ball_vel[1] * i)]
+            pos = [int(ball_pos[0] - self.ball_vel[0] * i),
+                   int(ball_pos[1] - self.ball_vel[1] * i)]
             size = BALL_SIZE - i * 2
             cv2.circle(game_frame, tuple(pos), size, (255, 255, 255), -1)
 
     def draw_score(self, game_frame):
+        # Scores with shadow, re-rasterized only when they change
         score_y = 50
-        # Left score with shadow
-        cv2.putText(game_frame, str(self.left_score),
-                    (50, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
-        cv2.putText(game_frame, str(self.left_score),
-                    (50, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
-        
-        # Right score with shadow
-        cv2.putText(game_frame, str(self.right_score),
-                    (WINDOW_WIDTH-80, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (0, 0, 0), 4)
-        cv2.putText(game_frame, str(self.right_score),
-                    (WINDOW_WIDTH-80, score_y),
-                    cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 2)
-
-    def draw(self, frame, face_positions=None):
+        self.render.text(game_frame, str(self.left_score), (50, score_y), 2, SCORE_PASSES)
+        self.render.text(game_frame, str(self.right_score), (WINDOW_WIDTH-80, score_y), 2, SCORE_PASSES)
+
+    def draw(self, frame):
         # Use camera feed as background with dimming
-        game_frame = cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay = game_frame.copy()
-        cv2.addWeighted(overlay, 0.6, np.zeros_like(overlay), 0.4, 0, game_frame)
+        game_frame = self.render.dimmed_background(frame)
         
+        ball_pos, left_paddle, right_paddle = self.render_state(self.timestep.alpha)
+
         # Draw game elements with enhanced visuals
-        self.draw_paddle_with_glow(game_frame, 0, self.left_paddle, (200, 200, 200))
-        self.draw_paddle_with_glow(game_frame, WINDOW_WIDTH - PADDLE_WIDTH, self.right_paddle, (200, 200, 200))
-        self.draw_ball_with_trail(game_frame)
+        self.draw_paddle_with_glow(game_frame, 0, left_paddle, (200, 200, 200))
+        self.draw_paddle_with_glow(game_frame, WINDOW_WIDTH - PADDLE_WIDTH, right_paddle, (200, 200, 200))
+        self.draw_ball_with_trail(game_frame, ball_pos)
         self.draw_score(game_frame)
         
         return game_frame
 
     def draw_start_screen(self, frame, players_detected):
-        screen = cv2.resize(frame, (WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay = np.zeros_like(screen)
-
-        # Create gradient background
-        for i in range(WINDOW_HEIGHT):
-            alpha = i / WINDOW_HEIGHT
-            overlay[i] = [int(40 * alpha), int(100 * alpha), int(40 * alpha)]
-
-        # Blend gradient with camera feed
-        cv2.addWeighted(overlay, 0.6, screen, 0.7, 0, screen)
+        # Camera feed blended with the cached gradient
+        screen = self.render.gradient_background(frame)
 
         # Draw title with glow effect
-        title_text = "Two Player Pong"
         title_pos = (WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 - 50)
-        
-        # Draw glow
-        for offset in range(3):
-            cv2.putText(screen, title_text,
-                        (title_pos[0] - offset, title_pos[1]),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1.5,
-                        (0, 255 - offset*30, 0), 5-offset)
-        
-        # Main title
-        cv2.putText(screen, title_text, title_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 2)
-        
+        self.render.text(screen, "Two Player Pong", title_pos, 1.5, TITLE_PASSES)
+
         # Draw player status with visual feedback
         left_status = "Ready!" if self.left_player_ready else "Stand on left"
         right_status = "Ready!" if self.right_player_ready else "Stand on right"
-        
-        # Left player status
         left_color = (0, 255, 0) if self.left_player_ready else (0, 165, 255)
-        status_pos = (50, WINDOW_HEIGHT//2 + 50)
-        cv2.putText(screen, f"Player 1: {left_status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-        cv2.putText(screen, f"Player 1: {left_status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, left_color, 2)
-        
-        # Right player status
         right_color = (0, 255, 0) if self.right_player_ready else (0, 165, 255)
-        status_pos = (WINDOW_WIDTH - 350, WINDOW_HEIGHT//2 + 50)
-        cv2.putText(screen, f"Player 2: {right_status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 0), 3)
-        cv2.putText(screen, f"Player 2: {right_status}", status_pos,
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, right_color, 2)
+        self.render.text(screen, f"Player 1: {left_status}", (50, WINDOW_HEIGHT//2 + 50),
+                         1, status_passes(left_color))
+        self.render.text(screen, f"Player 2: {right_status}", (WINDOW_WIDTH - 350, WINDOW_HEIGHT//2 + 50),
+                         1, status_passes(right_color))
 
         # Draw start button when both players ready
         if self.left_player_ready and self.right_player_ready:
-            btn_y = WINDOW_HEIGHT - 150
-            cv2.rectangle(screen,
-                         (WINDOW_WIDTH//2 - 100, btn_y),
-                         (WINDOW_WIDTH//2 + 100, btn_y + 60),
-                         (0, 200, 0), -1)
-            cv2.rectangle(screen,
-                         (WINDOW_WIDTH//2 - 100, btn_y),
-                         (WINDOW_WIDTH//2 + 100, btn_y + 60),
-                         (0, 255, 0), 2)
-            cv2.putText(screen, "SPACE to Start",
-                        (WINDOW_WIDTH//2 - 90, btn_y + 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            self.render.start_button(screen, WINDOW_WIDTH//2, WINDOW_HEIGHT - 150)
 
         return screen
 
 def main():
+    parser = argparse.ArgumentParser(description="Two player head-controlled pong")
+    parser.add_argument('--no-predict', action='store_true',
+                        help="use plain time-constant smoothing instead of latency-compensated input")
+    parser.add_argument('--display-fps', type=float, default=DISPLAY_FPS,
+                        help="rate the game window is refreshed at")
+    parser.add_argument('--view-fps', type=float, default=SECONDARY_FPS,
+                        help="rate of the secondary players' camera view")
+    parser.add_argument('--split-frame', action='store_true',
+                        help="track each player with its own FaceMesh on their half of the frame")
+    parser.add_argument('--record', metavar='PATH', help="record the session for pong_replay.py")
+    parser.add_argument('--seed', type=int, help="seed for ball serves (random by default)")
+    parser.add_argument('--detector', choices=BACKEND_CHOICES, default='auto',
+                        help="face detector backend (default: cheapest providing the nose tip)")
+    parser.add_argument('--cascade', action='store_true',
+                        help="gate the detector with a cheaper one that only looks for faces")
+    parser.add_argument('--trace', metavar='PATH',
+                        help="write per-frame stage timings as a Chrome trace (chrome://tracing)")
+    args = parser.parse_args()
+
+    tracer = Tracer(args.trace)
     cap = cv2.VideoCapture(0)
-    game = TwoPlayerPong()
+    game = TwoPlayerPong(seed=args.seed)
+    if args.record:
+        game.recorder = SessionRecorder(args.record, game)
+    game.predict_input = not args.no_predict
+    if args.split_frame:
+        tracker = SplitFrameTracker(detector=args.detector, cascade=args.cascade, tracer=tracer)
+    else:
+        tracker = None
+        face_detector = select_backend(REQUIRED_LANDMARKS, args.detector, args.cascade, max_faces=2,
+                                       detection_confidence=DETECTION_CONFIDENCE,
+                                       tracking_confidence=DETECTION_CONFIDENCE)
+
+    # HighGUI runs on its own thread; the camera view refreshes at a lower rate
+    display = DisplayService(args.display_fps, tracer=tracer)
+    display.add_window(WINDOW_NAME)
+    display.add_window(VIEW_NAME, args.view_fps)
+    display.start()
+    running = True
     
     print("Two Player Pong - Use your heads to control the paddles!")
     print("Player 1: Stand on left side")
     print("Player 2: Stand on right side")
     print("Press 'q' to quit")
     
-    while True:
+    while running:
+        tracer.frame()
+        tracer.stage('capture')
         ret, frame = cap.read()
         if not ret:
             break
+        capture_time = time.perf_counter()
         
+        tracer.stage('preprocess')
         frame = cv2.flip(frame, 1)  # Mirror display
         
-        # Process faces
-        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
         frame_h, frame_w = frame.shape[:2]
         
-        # Track faces and determine positions
-        faces = []
-        if results.multi_face_landmarks:
-            for face_lm in results.multi_face_landmarks:
-                nose_tip = face_lm.landmark[1]
-                x_pos = int(nose_tip.x * frame_w)
-                y_pos = nose_tip.y
-                faces.append((x_pos, y_pos))
-                cv2.circle(frame, (x_pos, int(y_pos * frame_h)), 5, (0, 255, 0), -1)
+        # Track faces and determine positions: [left player, right player]
+        if tracker is not None:
+            # Each half converts its own slice, so preprocessing happens inside inference here
+            tracer.stage('inference')
+            players = tracker.process(frame)
+            tracer.stage('postprocess')
+            faces = [player for player in players if player is not None]
+        else:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            tracer.stage('inference')
+            results = face_detector.process(rgb_frame)
+            tracer.stage('postprocess')
+            faces = []
+            if results.multi_face_landmarks:
+                for face_lm in results.multi_face_landmarks:
+                    nose_tip = face_lm.landmark[1]
+                    faces.append((int(nose_tip.x * frame_w), nose_tip.y))
+            # Sorted by x, so players swap paddles if they cross
+            faces.sort(key=lambda x: x[0])
+            players = faces[:2] if len(faces) >= 2 else [None, None]
+
+        for x_pos, y_pos in faces:
+            cv2.circle(frame, (x_pos, int(y_pos * frame_h)), 5, (0, 255, 0), -1)
+        left, right = players
         
         if game.game_state == START_SCREEN:
-            # Update player readiness
-            if len(faces) >= 2:
-                faces.sort(key=lambda x: x[0])  # Sort by x position
-                # Mark players as ready if they're on correct sides
-                game.left_player_ready = faces[0][0] < frame_w * 0.4
-                game.right_player_ready = faces[1][0] > frame_w * 0.6
-            else:
-                game.left_player_ready = False
-                game.right_player_ready = False
+            # Mark players as ready if they're on correct sides
+            game.left_player_ready = left is not None and left[0] < frame_w * 0.4
+            game.right_player_ready = right is not None and right[0] > frame_w * 0.6
             
             # Draw start screen
+            tracer.stage('draw')
             screen = game.draw_start_screen(frame, len(faces))
-            
-            # Check for game start
-            if game.left_player_ready and game.right_player_ready:
-                if cv2.waitKey(1) & 0xFF == ord(' '):
-                    game.game_state = PLAYING
-                    
-            cv2.imshow('Two Player Pong', screen)
+            tracer.stage('display')
+            display.show(WINDOW_NAME, screen, stamp=capture_time)
             
         elif game.game_state == PLAYING:
             # Get player positions
-            left_y = right_y = None
-            if len(faces) >= 2:
-                faces.sort(key=lambda x: x[0])
-                left_y, right_y = faces[0][1], faces[1][1]
+            left_y = left[1] if left is not None else None
+            right_y = right[1] if right is not None else None
             
             # Update and draw game
-            game.update(left_y, right_y)
+            game.update(left_y, right_y, capture_time=capture_time)
+            tracer.stage('draw')
             game_frame = game.draw(frame)
-            cv2.imshow('Two Player Pong', game_frame)
-        
-        # Show player view
-        cv2.imshow('Players View', frame)
+            tracer.stage('display')
+            display.show(WINDOW_NAME, game_frame, stamp=capture_time)
+            latency = display.latency(WINDOW_NAME)
+            if latency is not None:
+                game.record_latency(latency)
         
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        # Show player view; skipped entirely between its slower refreshes
+        tracer.stage('display')
+        display.show(VIEW_NAME, frame)
+
+        if game.recorder is not None:
+            game.recorder.frame(capture_time)
+
+        for key in display.keys():
+            if game.recorder is not None:
+                game.recorder.key(key)
+            running = game.handle_key(key) and running
     
     cap.release()
-    cv2.destroyAllWindows()
+    display.close()
+    tracer.close()
+    if game.recorder is not None:
+        game.recorder.close()
+    if tracker is not None:
+        tracker.close()
+    else:
+        face_detector.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,98 @@
+import threading
+from collections import deque
+
+import cv2
+import numpy as np
+
+QUEUE_SIZE = 8          # Frames waiting for the encoder before the drop policy kicks in
+DROP_OLDEST = 'oldest'
+DROP_NEWEST = 'newest'
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+
+class VideoRecorder:
+    """Encodes frames to a video file on a background thread, never stalling the caller.
+
+    write() copies the frame into a buffer from a small reusable pool and
+    returns; the encoder thread drains the queue (OpenCV releases the GIL
+    while encoding). When the queue is full the policy decides what goes:
+    DROP_OLDEST keeps the recording current, DROP_NEWEST keeps it contiguous
+    up to the stall.
+    """
+
+    def __init__(self, path, fps, queue_size=QUEUE_SIZE, policy=DROP_OLDEST, fourcc='mp4v'):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"drop policy must be one of {DROP_POLICIES}")
+        self.path = path
+        self.fps = fps
+        self.queue_size = queue_size
+        self.policy = policy
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.writer = None
+        self.shape = None
+        self.pending = deque()
+        self.free = []
+        self.condition = threading.Condition()
+        self.closing = False
+        self.thread = None
+        self.encoded = 0
+        self.dropped = 0
+
+    def _open(self, frame):
+        h, w = frame.shape[:2]
+        self.writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, (w, h))
+        if not self.writer.isOpened():
+            raise RuntimeError(f"could not open {self.path} for writing")
+        self.shape = frame.shape
+        self.thread = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        """Queue a copy of the frame; returns False if the policy dropped it"""
+        if self.writer is None:
+            self._open(frame)
+        elif frame.shape != self.shape:
+            raise ValueError(f"frame shape {frame.shape} differs from the recording's {self.shape}")
+
+        with self.condition:
+            if len(self.pending) >= self.queue_size:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return False
+                buffer = self.pending.popleft()
+            elif self.free:
+                buffer = self.free.pop()
+            else:
+                buffer = np.empty_like(frame)
+        # The copy happens outside the lock so the encoder never waits on it
+        np.copyto(buffer, frame)
+        with self.condition:
+            self.pending.append(buffer)
+            self.condition.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closing:
+                    self.condition.wait()
+                if not self.pending:
+                    break
+                buffer = self.pending.popleft()
+            self.writer.write(buffer)
+            with self.condition:
+                self.free.append(buffer)
+                self.encoded += 1
+        self.writer.release()
+
+    def stats(self):
+        return {'encoded': self.encoded, 'dropped': self.dropped, 'queued': len(self.pending)}
+
+    def close(self):
+        """Encode whatever is still queued and finish the file"""
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None